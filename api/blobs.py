@@ -0,0 +1,247 @@
+import os
+import shutil
+import asyncio
+import base64
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import select, update, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.config import settings
+from database.models import ImageBlobs, Products, Forms
+
+from .images import image_executor
+from .derivatives import variant_paths
+from .static import static_to_disk
+from .utils import correct_padding, save_imgs
+
+
+def image_digest(encoded_data: str) -> str:
+    return hashlib.sha256(base64.b64decode(correct_padding(encoded_data))).hexdigest()
+
+
+def blob_paths(digest: str) -> Tuple[str, str]:
+    # (путь на диске, путь для БД и URL)
+    return (
+        rf"{settings.STATIC_FOLDER}/img/{digest}.png",
+        rf"static/img/{digest}.png",
+    )
+
+
+async def acquire(session: AsyncSession, digests: Iterable[str]) -> Set[str]:
+    """
+    Увеличивает счетчики ссылок и возвращает хэши записей, созданных этим
+    вызовом (xmax = 0 у вставленной, а не обновленной строки). Строки
+    остаются заблокированными до конца транзакции, поэтому файлы новых
+    записей пишутся под блокировкой и не пересекаются с remove_orphans().
+    """
+    counts = Counter(digests)
+    if not counts:
+        return set()
+    # Один порядок блокировок во всех транзакциях — без взаимоблокировок
+    stmt = insert(ImageBlobs).values(
+        [
+            {"hash": digest, "path": blob_paths(digest)[1], "refcount": counts[digest]}
+            for digest in sorted(counts)
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ImageBlobs.hash],
+        set_={"refcount": ImageBlobs.refcount + stmt.excluded.refcount},
+    ).returning(ImageBlobs.hash, literal_column("xmax = 0").label("inserted"))
+    result = await session.execute(stmt)
+    return {row.hash for row in result if row.inserted}
+
+
+async def store_images(session: AsyncSession, encoded_images: List[str]) -> List[str]:
+    """
+    Сохраняет изображения в хранилище с адресацией по содержимому и
+    возвращает их пути. Уже известные изображения не декодируются и не
+    перекодируются, у них только увеличивается счетчик ссылок.
+    """
+    if not encoded_images:
+        return []
+
+    digests = await asyncio.gather(
+        *(image_executor.run(image_digest, data) for data in encoded_images)
+    )
+    sources: Dict[str, str] = {}
+    for digest, data in zip(digests, encoded_images):
+        sources.setdefault(digest, data)
+
+    # Сначала запись блокируется и счетчик увеличивается, потом решается,
+    # писать ли файл: иначе параллельное удаление последней ссылки могло
+    # удалить файл изображения, которое только что сочли существующим
+    created = await acquire(session, digests)
+    await save_imgs([(sources[digest], blob_paths(digest)[0]) for digest in sorted(created)])
+    return [blob_paths(digest)[1] for digest in digests]
+
+
+async def release(session: AsyncSession, paths: Iterable[str]) -> List[str]:
+    """
+    Уменьшает счетчики ссылок и удаляет записи, на которые больше никто
+    не ссылается. Возвращает пути, файлы которых после commit удаляет
+    remove_orphans().
+    """
+    orphans = []
+    for path, count in Counter(paths).items():
+        result = await session.execute(
+            update(ImageBlobs)
+            .where(ImageBlobs.path == path)
+            .values(refcount=ImageBlobs.refcount - count)
+            .returning(ImageBlobs.refcount)
+        )
+        refcount = result.scalar()
+        if refcount is not None and refcount <= 0:
+            orphans.append(path)
+
+    if orphans:
+        await session.execute(delete(ImageBlobs).where(ImageBlobs.path.in_(orphans)))
+    return orphans
+
+
+def remove_files(paths: Iterable[str]):
+    for path in paths:
+        disk_path = static_to_disk(path)
+        files = [disk_path] + [
+            variant for sizes in variant_paths(disk_path).values() for variant in sizes.values()
+        ]
+        for file in files:
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+
+async def remove_orphans(session: AsyncSession, paths: Iterable[str]):
+    """
+    Удаляет файлы изображений, записи которых release() удалил в уже
+    закоммиченной транзакции. Перед удалением ключ каждого изображения
+    снова занимается пустой записью (refcount = 0): если тем временем
+    изображение загрузили заново, вставка дождется той транзакции и увидит
+    ее запись — такие файлы не трогаются. Пока файлы удаляются, пустая
+    запись не дает store_images() записать их повторно.
+    """
+    digests = sorted({os.path.splitext(os.path.basename(path))[0] for path in paths})
+    if not digests:
+        return
+    stmt = insert(ImageBlobs).values(
+        [{"hash": digest, "path": blob_paths(digest)[1], "refcount": 0} for digest in digests]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ImageBlobs.hash],
+        set_={"refcount": ImageBlobs.refcount},
+    ).returning(ImageBlobs.hash, literal_column("xmax = 0").label("inserted"))
+    unused = [row.hash for row in await session.execute(stmt) if row.inserted]
+    remove_files(blob_paths(digest)[1] for digest in unused)
+    if unused:
+        await session.execute(delete(ImageBlobs).where(ImageBlobs.hash.in_(unused)))
+    await session.commit()
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def copy_to_blob(path: str, digest: str) -> List[str]:
+    """
+    Копирует файл и его производные в хранилище по содержимому. Возвращает
+    исходные файлы: их удаляют только после commit миграции, чтобы при
+    откате старые пути в базе по-прежнему указывали на существующие файлы.
+    """
+    source = static_to_disk(path)
+    target = blob_paths(digest)[0]
+    if source == target:
+        return []
+    copies = [(source, target)] + [
+        (variant_paths(source)[fmt][width], variant_paths(target)[fmt][width])
+        for fmt in variant_paths(source)
+        for width in settings.IMAGE_SIZES
+    ]
+    originals = []
+    for src, dst in copies:
+        if not os.path.exists(src):
+            continue
+        if not os.path.exists(dst):
+            # Через временный файл: прерванная копия не займет путь хранилища
+            shutil.copy2(src, f"{dst}.tmp")
+            os.replace(f"{dst}.tmp", dst)
+        originals.append(src)
+    return originals
+
+
+async def migrate(session: AsyncSession) -> int:
+    """
+    Одноразовый перенос старых файлов `{id}_{i}_product.png` и `{id}_form.png`
+    в хранилище по содержимому. Для старых файлов хэш считается по
+    сохраненному PNG, так как исходные байты загрузки уже недоступны.
+    """
+    digests = {}
+
+    def migrate_path(path: str) -> str:
+        if path not in digests:
+            source = static_to_disk(path)
+            stem = os.path.splitext(os.path.basename(path))[0]
+            if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+                # Уже лежит в хранилище (повторный запуск или новая загрузка)
+                digests[path] = stem
+            elif not os.path.exists(source):
+                print(f"Skip {path}: file not found")
+                digests[path] = None
+            else:
+                digests[path] = file_digest(source)
+                originals.extend(copy_to_blob(path, digests[path]))
+        if digests[path] is None:
+            return path
+        references.append(digests[path])
+        return blob_paths(digests[path])[1]
+
+    moved = 0
+    references = []
+    originals = []
+    async with session.begin():
+        await session.execute(delete(ImageBlobs))
+
+        products = (await session.execute(select(Products.id, Products.images))).all()
+        for row in products:
+            new_images = [migrate_path(path) for path in row.images or []]
+            if new_images != row.images:
+                await session.execute(
+                    update(Products).where(Products.id == row.id).values(images=new_images)
+                )
+                moved += 1
+
+        forms = (await session.execute(select(Forms.id, Forms.image))).all()
+        for row in forms:
+            if not row.image:
+                continue
+            new_image = migrate_path(row.image)
+            if new_image != row.image:
+                await session.execute(
+                    update(Forms).where(Forms.id == row.id).values(image=new_image)
+                )
+                moved += 1
+
+        await acquire(session, references)
+
+    for path in originals:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return moved
+
+
+if __name__ == "__main__":
+    # python -m api.blobs
+    from database.session import async_session_maker
+
+    async def main():
+        async with async_session_maker() as session:
+            print(f"Rows rewritten: {await migrate(session)}")
+
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import functools
+from inspect import Parameter, signature
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi_cache import FastAPICache, JsonCoder
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+
+from config.config import settings
+
+from .responses import JSONBytesResponse, encode_json
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "epocha"
+
+# Теги (namespace в fastapi-cache) и время жизни ответов в секундах
+PRODUCTS = "products"
+CATEGORY = "category"
+PRECATEGORY = "preCategory"
+COLORS = "colors"
+FORMS = "forms"
+REVIEWS = "reviews"
+
+TTL = {
+    PRODUCTS: 300,
+    CATEGORY: 3600,
+    PRECATEGORY: 3600,
+    COLORS: 3600,
+    FORMS: 3600,
+    REVIEWS: 120,
+}
+
+
+class ResponseCoder(JsonCoder):
+    """
+    Хранит в кэше готовое JSON-тело ответа и отдает его без повторной
+    сериализации.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, Response):
+            return value.body
+        return encode_json(value)
+
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_: Optional[type]) -> Any:
+        return JSONBytesResponse(content=value)
+
+
+def request_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> str:
+    # Ключ строится по адресу запроса: в kwargs лежит AsyncSession,
+    # repr которой меняется на каждый запрос
+    if request is not None:
+        query = sorted(request.query_params.multi_items())
+        raw = f"{request.url.path}:{query}"
+    else:
+        raw = f"{func.__module__}:{func.__name__}:{args}"
+    return f"{namespace}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+# Общий для всех воркеров клиент Redis (None — без REDIS_URL)
+redis_client = None
+
+
+async def init_cache():
+    global redis_client
+    if settings.REDIS_URL:
+        redis_client = aioredis.from_url(settings.REDIS_URL)
+        backend = RedisBackend(redis_client)
+    else:
+        # Кэш в памяти процесса: согласован только при одном воркере
+        redis_client = None
+        backend = InMemoryBackend()
+
+    FastAPICache.init(
+        backend,
+        prefix=CACHE_PREFIX,
+        coder=ResponseCoder,
+        key_builder=request_key_builder,
+        enable=settings.CACHE_ENABLED,
+    )
+
+
+async def invalidate(*namespaces: str):
+    for namespace in namespaces:
+        try:
+            await FastAPICache.clear(namespace=namespace)
+        except Exception:
+            logger.warning("Error clearing cache namespace '%s'", namespace, exc_info=True)
+
+
+async def shared_version(name: str) -> Optional[int]:
+    """
+    Счетчик версии в Redis, общий для всех воркеров. None — Redis не
+    настроен или недоступен: тогда вызывающий полагается на свои данные.
+    """
+    if redis_client is None:
+        return None
+    try:
+        value = await redis_client.get(f"{CACHE_PREFIX}-version:{name}")
+    except Exception:
+        logger.warning("Error reading shared version '%s'", name, exc_info=True)
+        return None
+    return int(value) if value is not None else 0
+
+
+async def bump_shared_version(name: str):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.incr(f"{CACHE_PREFIX}-version:{name}")
+    except Exception:
+        logger.warning("Error bumping shared version '%s'", name, exc_info=True)
+
+
+async def cached_response(
+    request: Request, namespace: str, expire: int, build: Callable[[], Awaitable[bytes]]
+) -> bytes:
+    """
+    Тело ответа из кэша или `build()`; ключ — тот же, что строит
+    request_key_builder, поэтому invalidate(namespace) его очищает.
+    """
+    if not FastAPICache.get_enable():
+        return await build()
+
+    key = request_key_builder(
+        build, f"{FastAPICache.get_prefix()}:{namespace}", request=request, args=(), kwargs={}
+    )
+    backend = FastAPICache.get_backend()
+    try:
+        cached = await backend.get(key)
+    except Exception:
+        logger.warning("Error reading cache key '%s'", key, exc_info=True)
+        cached = None
+    if cached is not None:
+        return cached
+
+    body = await build()
+    try:
+        await backend.set(key, body, expire)
+    except Exception:
+        logger.warning("Error setting cache key '%s'", key, exc_info=True)
+    return body
+
+
+def cached(namespace: str, expire: Optional[int] = None):
+    """
+    Кэширует JSON-ответ эндпоинта через cached_response(). В отличие от
+    fastapi_cache.decorator.cache не добавляет Cache-Control: max-age и
+    ETag: промах и попадание отдаются одинаково, и после invalidate()
+    клиенты и прокси не держат старый ответ до конца TTL.
+    """
+    expire = TTL[namespace] if expire is None else expire
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        wrapped = signature(func)
+        request_name = next(
+            (name for name, param in wrapped.parameters.items() if param.annotation is Request),
+            None,
+        )
+        parameters = list(wrapped.parameters.values())
+        if request_name is None:
+            request_name = "_cache_request"
+            parameters.append(
+                Parameter(request_name, Parameter.KEYWORD_ONLY, annotation=Request)
+            )
+
+        @functools.wraps(func)
+        async def endpoint(*args, **kwargs):
+            request = kwargs[request_name]
+            if request_name == "_cache_request":
+                del kwargs[request_name]
+
+            async def build() -> bytes:
+                return ResponseCoder.encode(await func(*args, **kwargs))
+
+            return JSONBytesResponse(await cached_response(request, namespace, expire, build))
+
+        endpoint.__signature__ = wrapped.replace(parameters=parameters)
+        return endpoint
+
+    return decorator
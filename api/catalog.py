@@ -0,0 +1,110 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config.config import settings
+
+from .cache import bump_shared_version, shared_version
+from .responses import encode_json
+
+# Имя общего счетчика версии каталога в Redis
+VERSION_KEY = "catalog"
+
+
+class CatalogSnapshot:
+    """
+    Снимок каталога для GET /api/products.
+
+    Хранит собранный ответ `{"Products": [...]}` и его JSON в байтах.
+    Любая запись в products/colors/forms/preCategoryProducts вызывает
+    `invalidate()`, после чего следующий запрос пересобирает снимок.
+
+    Снимок свой в каждом воркере, поэтому `invalidate()` увеличивает еще и
+    общий счетчик в Redis, а каждый запрос сверяет с ним версию снимка:
+    запись через один воркер сбрасывает снимки во всех. Без Redis снимок
+    пересобирается не реже чем раз в `max_age` секунд.
+    """
+
+    def __init__(self, max_age: float = 60):
+        self.max_age = max_age
+        self.version = 0
+        self._built_version = -1
+        self._built_shared: Optional[int] = None
+        self._built_at = 0.0
+        self._payload: Optional[Dict[str, Any]] = None
+        self._body: Optional[bytes] = None
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.rebuild_time_total = 0.0
+        self.rebuild_time_last = 0.0
+
+    async def invalidate(self):
+        self.version += 1
+        await bump_shared_version(VERSION_KEY)
+
+    def _is_fresh(self, shared: Optional[int]) -> bool:
+        return (
+            self._body is not None
+            and self._built_version == self.version
+            and (shared is None or self._built_shared == shared)
+            and time.monotonic() - self._built_at < self.max_age
+        )
+
+    async def get(
+        self, build: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bytes]:
+        shared = await shared_version(VERSION_KEY)
+        if self._is_fresh(shared):
+            self.hits += 1
+            return self._payload, self._body
+
+        # Пересборку делает только один запрос, остальные ждут его результат
+        async with self._lock:
+            if self._is_fresh(shared):
+                self.hits += 1
+                return self._payload, self._body
+
+            self.misses += 1
+            version = self.version
+            built_at = time.monotonic()
+            started = time.perf_counter()
+            payload = await build()
+            body = encode_json(payload)
+            elapsed = time.perf_counter() - started
+
+            self.rebuilds += 1
+            self.rebuild_time_last = elapsed
+            self.rebuild_time_total += elapsed
+
+            # Если во время сборки каталог изменился, снимок сразу считается
+            # устаревшим и будет пересобран на следующем запросе
+            self._payload = payload
+            self._body = body
+            self._built_version = version
+            self._built_shared = shared
+            self._built_at = built_at
+            return payload, body
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "built_version": self._built_version,
+            "built_shared_version": self._built_shared,
+            "age": time.monotonic() - self._built_at if self._body is not None else None,
+            "max_age": self.max_age,
+            "fresh": self._is_fresh(self._built_shared),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "rebuild_time_last": self.rebuild_time_last,
+            "rebuild_time_avg": (
+                self.rebuild_time_total / self.rebuilds if self.rebuilds else 0.0
+            ),
+            "size_bytes": len(self._body) if self._body is not None else 0,
+        }
+
+
+catalog_snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT_MAX_AGE)
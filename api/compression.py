@@ -0,0 +1,248 @@
+import gzip
+import asyncio
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.config import settings
+
+try:
+    import brotli
+except ImportError:  # без brotli остается только gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+)
+
+# Тела от этого размера сжимаются в пуле потоков, а не в цикле событий
+EXECUTOR_MIN_SIZE = 64 * 1024
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(headers: Headers) -> Optional[str]:
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5 if level is None else level)
+    return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+
+
+async def compress_async(data: bytes, encoding: str) -> bytes:
+    # Сжатие большого тела (особенно brotli) заняло бы цикл событий на
+    # десятки миллисекунд
+    if len(data) < EXECUTOR_MIN_SIZE:
+        return compress(data, encoding)
+    return await asyncio.get_running_loop().run_in_executor(None, compress, data, encoding)
+
+
+def weaken_etag(headers: MutableHeaders):
+    # ETag считается по несжатому телу; у сжатого варианта другие байты,
+    # поэтому он отдается как слабый W/"..."
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=5)
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+            self._process = self._compressor.process
+        else:
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+            self._process = self._compressor.compress
+
+    def chunk(self, data: bytes) -> bytes:
+        # Сбрасываем буфер на каждом куске, чтобы клиент получал данные сразу
+        return self._process(data) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressedBodyCache:
+    """
+    LRU сжатых тел ответов по хэшу исходного тела. Повторные ответы
+    (снимок каталога, попадания в кэш ответов) не сжимаются заново.
+    Размер ограничен суммой сжатых тел `max_bytes`; сжатые тела больше
+    `max_entry_bytes` не хранятся и сжимаются на каждом запросе.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    async def get(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return compressed
+
+        self.misses += 1
+        compressed = await compress_async(body, encoding)
+        if len(compressed) > self.max_entry_bytes:
+            self.skipped += 1
+            return compressed
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        return compressed
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+        }
+
+
+compressed_cache = CompressedBodyCache(
+    settings.COMPRESSION_CACHE_BYTES, settings.COMPRESSION_CACHE_MAX_ENTRY_BYTES
+)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает (br/gzip) JSON, NDJSON и CSV ответы API размером от
+    `minimum_size` байт. Потоковые ответы сжимаются по кускам.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        paths: Tuple[str, ...] = ("/api",),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.paths = paths
+        self.cache = compressed_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(send, encoding, self.minimum_size, self.cache)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int, cache: CompressedBodyCache):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Заголовки отправляются вместе с первым куском тела
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = "content-encoding" in headers or not content_type.startswith(
+                COMPRESSIBLE_TYPES
+            )
+            if message["status"] == 304:
+                # 304 подтверждает сжатый вариант, который клиент получил раньше
+                weaken_etag(MutableHeaders(raw=message["headers"]))
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    await self._send(self.start_message)
+                    self.start_message = None
+                    await self._send(message)
+                    return
+                body = await self.cache.get(body, self.encoding)
+                headers["Content-Encoding"] = self.encoding
+                weaken_etag(headers)
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                await self._send(self.start_message)
+                self.start_message = None
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            # Потоковый ответ: длина заранее неизвестна
+            del headers["Content-Length"]
+            headers["Content-Encoding"] = self.encoding
+            weaken_etag(headers)
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = StreamCompressor(self.encoding)
+            await self._send(self.start_message)
+            self.start_message = None
+
+        if self.compressor is None:
+            await self._send(message)
+            return
+
+        chunk = self.compressor.chunk(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
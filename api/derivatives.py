@@ -0,0 +1,124 @@
+import os
+import sys
+from typing import Dict, List
+
+from config.config import settings
+
+# Форматы производных изображений: расширение и параметры кодека (имена
+# констант cv2 — OpenCV загружается только там, где пишутся изображения)
+VARIANT_FORMATS = {
+    "webp": (".webp", [("IMWRITE_WEBP_QUALITY", 80)]),
+    "jpeg": (".jpg", [("IMWRITE_JPEG_QUALITY", 85), ("IMWRITE_JPEG_OPTIMIZE", 1)]),
+}
+
+
+def encode_params(cv2, params) -> List[int]:
+    return [value for name, option in params for value in (getattr(cv2, name), option)]
+
+
+def variant_path(path: str, width: int, fmt: str) -> str:
+    stem, _ = os.path.splitext(path)
+    return f"{stem}_{width}{VARIANT_FORMATS[fmt][0]}"
+
+
+def variant_paths(path: str) -> Dict[str, Dict[int, str]]:
+    # Все возможные копии; записываются только ширины меньше исходной (variant_widths)
+    return {
+        fmt: {width: variant_path(path, width, fmt) for width in settings.IMAGE_SIZES}
+        for fmt in VARIANT_FORMATS
+    }
+
+
+def variant_widths(width: int) -> List[int]:
+    # Ширины из IMAGE_SIZES меньше исходной: копии не увеличиваются
+    return [target for target in settings.IMAGE_SIZES if target < width]
+
+
+def existing_variant_paths(path: str, disk_path: str) -> Dict[str, Dict[int, str]]:
+    """
+    variant_paths(path) только с копиями, которые лежат на диске рядом с
+    `disk_path`: в srcset не попадают ширины больше исходного изображения.
+    """
+    return {
+        fmt: {
+            width: variant
+            for width, variant in sizes.items()
+            if os.path.exists(variant_path(disk_path, width, fmt))
+        }
+        for fmt, sizes in variant_paths(path).items()
+    }
+
+
+def write_variants(img, filename: str) -> List[str]:
+    """
+    Пишет рядом с оригиналом уменьшенные копии в WebP и JPEG для каждой
+    ширины из IMAGE_SIZES меньше исходной. Изображения не увеличиваются:
+    копии остальных ширин не пишутся, а оставшиеся от прежних версий
+    удаляются, чтобы srcset не обещал несуществующую ширину.
+    """
+    import cv2
+
+    height, width = img.shape[:2]
+    widths = variant_widths(width)
+    for target in settings.IMAGE_SIZES:
+        if target in widths:
+            continue
+        for fmt in VARIANT_FORMATS:
+            try:
+                os.remove(variant_path(filename, target, fmt))
+            except FileNotFoundError:
+                pass
+
+    written = []
+    for target in widths:
+        resized = cv2.resize(
+            img,
+            (target, max(1, round(height * target / width))),
+            interpolation=cv2.INTER_AREA,
+        )
+        for fmt, (_, params) in VARIANT_FORMATS.items():
+            path = variant_path(filename, target, fmt)
+            if cv2.imwrite(path, resized, encode_params(cv2, params)):
+                written.append(path)
+    return written
+
+
+def png_width(path: str) -> int:
+    # Ширина из заголовка IHDR, без декодирования изображения
+    with open(path, "rb") as file:
+        header = file.read(24)
+    return int.from_bytes(header[16:20], "big")
+
+
+def backfill(folder: str) -> int:
+    """
+    Создает производные для уже загруженных PNG, у которых их нет, и
+    удаляет копии шире исходного изображения.
+    """
+    import cv2
+
+    count = 0
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not name.endswith(".png") or not os.path.isfile(path):
+            continue
+        widths = variant_widths(png_width(path))
+        if all(
+            os.path.exists(p) == (width in widths)
+            for sizes in variant_paths(path).values()
+            for width, p in sizes.items()
+        ):
+            continue
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"Skip {path}: cannot decode")
+            continue
+        write_variants(img, path)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # python -m api.derivatives [папка]
+    folder = sys.argv[1] if len(sys.argv) > 1 else f"{settings.STATIC_FOLDER}/img"
+    print(f"Variants created for {backfill(folder)} images")
@@ -0,0 +1,205 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import (
+    Products,
+    ProductRatingStats,
+    Colors,
+    Forms,
+    PreCategoryProducts,
+    product_precategory_association,
+    product_form_association,
+    product_color_association,
+)
+
+from .ratings import rating_summary
+from .responses import encode_json
+from .urls import static_urls
+
+# Сколько строк за раз забирается из серверного курсора
+EXPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = (
+    "id",
+    "ru_name",
+    "ru_desc",
+    "en_name",
+    "en_desc",
+    "images",
+    "isFrom",
+    "price_ru",
+    "price_en",
+    "isForm",
+    "isColor",
+    "forms",
+    "colors",
+    "preCategory",
+    "rating_count",
+    "rating_average",
+)
+
+
+def linked_ids(association, key, order_by):
+    # Массив id связанных строк товара в заданном порядке
+    return (
+        select(func.array_agg(aggregate_order_by(association.c[key], order_by)))
+        .where(association.c.product_id == Products.id)
+        .scalar_subquery()
+    )
+
+
+async def load_dictionaries(session: AsyncSession):
+    """
+    Цвета, формы и предкатегории — небольшие таблицы, они целиком
+    загружаются в память один раз на выгрузку.
+    """
+    colors = {
+        row.id: {"id": row.id, "ru_name": row.ru_name, "en_name": row.en_name, "rgb": row.rgb}
+        for row in await session.execute(
+            select(Colors.id, Colors.ru_name, Colors.en_name, Colors.rgb)
+        )
+    }
+    forms = {}
+    for row in await session.execute(
+        select(Forms.id, Forms.ru_name, Forms.en_name, Forms.changeForm, Forms.image)
+    ):
+        forms[row.id] = {
+            "id": row.id,
+            "ru_name": row.ru_name,
+            "en_name": row.en_name,
+            "changeForm": row.changeForm,
+            "image": static_urls.url(row.image),
+            "srcset": static_urls.srcset(row.image),
+        }
+    precategories = {
+        row.id: {
+            "id": row.id,
+            "address": row.address,
+            "ru_name": row.ru_name,
+            "en_name": row.en_name,
+        }
+        for row in await session.execute(
+            select(
+                PreCategoryProducts.id,
+                PreCategoryProducts.address,
+                PreCategoryProducts.ru_name,
+                PreCategoryProducts.en_name,
+            )
+        )
+    }
+    return colors, forms, precategories
+
+
+async def stream_products(session: AsyncSession) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Отдает товары по одному в формате GET /api/products, читая их из
+    серверного курсора: в памяти не держится больше одной пачки строк.
+    """
+    async with session:
+        colors, forms, precategories = await load_dictionaries(session)
+
+        stmt = (
+            select(
+                Products.id,
+                Products.ru_name_name,
+                Products.ru_name_desc,
+                Products.en_name_name,
+                Products.en_name_desc,
+                Products.images,
+                Products.isFrom,
+                Products.price_ru,
+                Products.price_en,
+                Products.options_isForm,
+                Products.options_isColor,
+                linked_ids(
+                    product_form_association, "form_id", product_form_association.c.position
+                ).label("form_ids"),
+                linked_ids(
+                    product_color_association, "color_id", product_color_association.c.position
+                ).label("color_ids"),
+                linked_ids(
+                    product_precategory_association,
+                    "precategory_id",
+                    product_precategory_association.c.precategory_id,
+                ).label("precategory_ids"),
+                ProductRatingStats.count.label("rating_count"),
+                ProductRatingStats.sum.label("rating_sum"),
+            )
+            .outerjoin(ProductRatingStats, ProductRatingStats.product_id == Products.id)
+            .order_by(Products.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+
+        result = await session.stream(stmt)
+        async for row in result:
+            images, srcset = static_urls.images(row.images)
+            yield {
+                "id": row.id,
+                "ru_name": {"name": row.ru_name_name, "desc": row.ru_name_desc},
+                "en_name": {"name": row.en_name_name, "desc": row.en_name_desc},
+                "images": images,
+                "srcset": srcset,
+                "isFrom": row.isFrom,
+                "price": {"ru_name": row.price_ru, "en_name": row.price_en},
+                "options": {
+                    "isForm": row.options_isForm,
+                    "isColor": row.options_isColor,
+                    "form": [forms[id_] for id_ in row.form_ids or [] if id_ in forms],
+                    "color": [colors[id_] for id_ in row.color_ids or [] if id_ in colors],
+                },
+                "preCategory": [
+                    precategories[id_]
+                    for id_ in row.precategory_ids or []
+                    if id_ in precategories
+                ],
+                "rating": rating_summary(row.rating_count, row.rating_sum),
+            }
+
+
+async def export_ndjson(session: AsyncSession) -> AsyncIterator[bytes]:
+    async for product in stream_products(session):
+        yield encode_json(product) + b"\n"
+
+
+def csv_line(values: List[Any]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode()
+
+
+async def export_csv(session: AsyncSession) -> AsyncIterator[bytes]:
+    # Списки в ячейках разделяются "|": изображения — URL, формы и цвета —
+    # английские названия, предкатегории — адреса
+    yield csv_line(CSV_COLUMNS)
+    async for product in stream_products(session):
+        yield csv_line(
+            [
+                product["id"],
+                product["ru_name"]["name"],
+                product["ru_name"]["desc"],
+                product["en_name"]["name"],
+                product["en_name"]["desc"],
+                "|".join(product["images"]),
+                product["isFrom"],
+                product["price"]["ru_name"],
+                product["price"]["en_name"],
+                product["options"]["isForm"],
+                product["options"]["isColor"],
+                "|".join(form["en_name"] for form in product["options"]["form"]),
+                "|".join(color["en_name"] for color in product["options"]["color"]),
+                "|".join(category["address"] for category in product["preCategory"]),
+                product["rating"]["count"],
+                product["rating"]["average"],
+            ]
+        )
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+}
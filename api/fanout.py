@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.config import settings
+
+Branch = Callable[[AsyncSession], Awaitable[Any]]
+
+
+async def fanout(
+    session: AsyncSession, branches: Dict[str, Branch], timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Выполняет независимые запросы чтения одновременно, каждый в своей
+    сессии на отдельном соединении из пула того же engine, что и `session`.
+    Возвращает {имя: результат} после завершения всех веток. Если одна
+    ветка падает или истекает `timeout`, остальные отменяются.
+
+    Ветки читают каждая в своей транзакции, поэтому запись, случившаяся
+    между ними, может быть видна только части ответа.
+
+    `session` не должна держать соединение (открытую транзакцию): иначе
+    запрос занимает одно соединение и ждет еще несколько, и при
+    исчерпании пула такие запросы блокируют друг друга до таймаута.
+    """
+    if timeout is None:
+        timeout = settings.DB_FANOUT_TIMEOUT
+    if len(branches) > 1 and session.in_transaction():
+        raise RuntimeError("fanout() requires a session without an open transaction")
+
+    async def run(branch: Branch) -> Any:
+        async with AsyncSession(session.bind, expire_on_commit=False) as branch_session:
+            return await branch(branch_session)
+
+    try:
+        async with asyncio.timeout(timeout):
+            if len(branches) == 1:
+                # Одна ветка — без лишнего соединения
+                (name, branch), = branches.items()
+                return {name: await branch(session)}
+
+            async with asyncio.TaskGroup() as group:
+                tasks = {name: group.create_task(run(branch)) for name, branch in branches.items()}
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Database query timed out")
+    except ExceptionGroup as error:
+        # Наружу — первая ошибка, как при последовательных запросах
+        raise error.exceptions[0]
+
+    return {name: task.result() for name, task in tasks.items()}
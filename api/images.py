@@ -0,0 +1,101 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config.config import settings
+
+from .metrics import metrics
+
+
+class ImageExecutor:
+    """
+    Пул потоков для декодирования и записи изображений.
+
+    OpenCV отпускает GIL внутри imdecode/imwrite, поэтому потоки
+    обрабатывают картинки параллельно и не блокируют event loop.
+    Одновременно в пуле находится не больше `queue_size` задач,
+    остальные запросы ждут освобождения места (backpressure).
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.wait_time_total = 0.0
+        self.process_time_total = 0.0
+        self.process_time_max = 0.0
+        self.process_time_last = 0.0
+
+    def _ensure_started(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="image-worker"
+            )
+            self._slots = asyncio.Semaphore(self.queue_size)
+
+    def _timed(self, func: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.process_time_last = elapsed
+            self.process_time_total += elapsed
+            self.process_time_max = max(self.process_time_max, elapsed)
+            metrics.observe_image(elapsed)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_time_total += time.perf_counter() - queued
+
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._pool, self._timed, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        self.processed += 1
+        return result
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._slots = None
+
+    def stats(self) -> Dict[str, Any]:
+        done = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "wait_time_avg": self.wait_time_total / done if done else 0.0,
+            "process_time_avg": self.process_time_total / done if done else 0.0,
+            "process_time_max": self.process_time_max,
+            "process_time_last": self.process_time_last,
+        }
+
+
+image_executor = ImageExecutor(settings.IMAGE_WORKERS, settings.IMAGE_QUEUE_SIZE)
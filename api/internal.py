@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import HTMLResponse, Response
+
+from database.session import engine
+
+from .catalog import catalog_snapshot
+from .images import image_executor
+from .compression import compressed_cache
+from .metatags import metatag_resolver
+from .profiling import profile_store, render_profile, require_profile_token
+
+# Все служебные эндпоинты закрыты токеном PROFILING_TOKEN (заголовок
+# X-Profile-Token или параметр token); без токена в настройках они недоступны
+router = APIRouter(
+    prefix="/internal", tags=["internal"], dependencies=[Depends(require_profile_token)]
+)
+
+
+@router.get(
+    "/catalog",
+    summary="Статистика снимка каталога",
+    description="Возвращает счетчики попаданий, промахов и времени пересборки снимка GET /api/products",
+    status_code=200,
+)
+async def get_catalog_stats():
+    return catalog_snapshot.stats()
+
+
+@router.get(
+    "/images",
+    summary="Статистика пула обработки изображений",
+    description="Возвращает глубину очереди, число задач в работе и время обработки одного изображения",
+    status_code=200,
+)
+async def get_image_stats():
+    return image_executor.stats()
+
+
+@router.get(
+    "/compression",
+    summary="Статистика кэша сжатых ответов",
+    description="Возвращает число записей и попаданий в кэш сжатых тел ответов API",
+    status_code=200,
+)
+async def get_compression_stats():
+    return compressed_cache.stats()
+
+
+@router.get(
+    "/metatags",
+    summary="Состояние метатегов в памяти",
+    description="Возвращает число загруженных метатегов и перезагрузок из базы",
+    status_code=200,
+)
+async def get_metatag_stats():
+    return metatag_resolver.stats()
+
+
+@router.get(
+    "/pool",
+    summary="Статистика пула соединений с базой",
+    description="Возвращает число занятых соединений, переполнение пула и гистограмму ожидания свободного соединения в этом воркере",
+    status_code=200,
+)
+async def get_pool_stats():
+    return engine.pool.stats()
+
+
+@router.get(
+    "/profiles",
+    summary="Сохраненные профили запросов",
+    description="Список последних медленных (и запрошенных заголовком X-Profile-Token) запросов с профилем, новые первыми",
+    status_code=200,
+)
+async def get_profiles():
+    return {
+        "profiled": profile_store.profiled,
+        "kept": profile_store.kept,
+        "profiles": profile_store.list(),
+    }
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Профиль запроса",
+    description="`format=html` — интерактивный отчет pyinstrument, `format=speedscope` — JSON для https://www.speedscope.app",
+    status_code=200,
+)
+async def get_profile(profile_id: int, format: str = Query("html", pattern="^(html|speedscope)$")):
+    found = profile_store.get(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    _, session = found
+
+    content = render_profile(session, format)
+    if format == "speedscope":
+        return Response(
+            content,
+            media_type="application/json",
+            headers={
+                "Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'
+            },
+        )
+    return HTMLResponse(content)
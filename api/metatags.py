@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Metatags
+
+from .responses import encode_json
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+FIELDS = ("address", "title", "description", "keywords")
+
+
+def normalize_address(address: str) -> str:
+    # "/catalog/chairs/?page=2" -> "/catalog/chairs"
+    address = address.split("?", 1)[0].split("#", 1)[0]
+    if len(address) > 1:
+        address = address.rstrip("/")
+    return address or "/"
+
+
+def split_address(address: str) -> List[str]:
+    return [part for part in address.split("/") if part]
+
+
+class TrieNode:
+    __slots__ = ("children", "wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        # Метатег шаблона "<путь>/*", действует на все вложенные адреса
+        self.wildcard: Optional[Dict[str, Any]] = None
+
+
+class MetatagResolver:
+    """
+    Метатеги в памяти процесса. Точные адреса ищутся в словаре,
+    шаблоны вида `/catalog/*` — в префиксном дереве по сегментам пути
+    (побеждает самый длинный подходящий шаблон). Запросы страниц
+    в базу не ходят: данные загружаются при старте, после изменений
+    через API и периодически в фоне (для остальных воркеров).
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        self._root = TrieNode()
+        self._all: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self.loaded = False
+        self.reloads = 0
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            async with session:
+                result = await session.execute(
+                    select(
+                        Metatags.address,
+                        Metatags.title,
+                        Metatags.description,
+                        Metatags.keywords,
+                    ).order_by(Metatags.address)
+                )
+                rows = [row._asdict() for row in result.all()]
+
+            exact = {}
+            root = TrieNode()
+            for row in rows:
+                address = normalize_address(row["address"])
+                if address == WILDCARD or address.endswith("/" + WILDCARD):
+                    node = root
+                    for part in split_address(address)[:-1]:
+                        node = node.children.setdefault(part, TrieNode())
+                    node.wildcard = row
+                else:
+                    exact[address] = row
+
+            # Замена целиком: читатели видят либо старую, либо новую версию
+            self._exact, self._root, self._all = exact, root, rows
+            self.loaded = True
+            self.reloads += 1
+
+    def resolve(self, address: str) -> Optional[Dict[str, Any]]:
+        address = normalize_address(address)
+        found = self._exact.get(address)
+        if found is not None:
+            return found
+
+        node = self._root
+        found = node.wildcard
+        for part in split_address(address):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.wildcard is not None:
+                found = node.wildcard
+        return found
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self._all
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "reloads": self.reloads,
+            "exact": len(self._exact),
+            "total": len(self._all),
+        }
+
+
+def encode_with_etag(payload: Any):
+    body = encode_json(payload)
+    return body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверка If-None-Match: список ETag через запятую или "*". Сравнение
+    слабое — сжатые варианты ответа отдаются со слабым W/"..." ETag.
+    """
+    if not if_none_match:
+        return False
+    value = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == value:
+            return True
+    return False
+
+
+async def refresh_periodically(resolver: MetatagResolver, session_maker, interval: float):
+    # Подхватывает изменения, сделанные через другие воркеры
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await resolver.load(session_maker())
+        except Exception:
+            logger.warning("Error refreshing metatags", exc_info=True)
+
+
+metatag_resolver = MetatagResolver()
@@ -0,0 +1,281 @@
+import time
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus: счетчики по корзинам для каждого набора
+    меток. observe() вызывается и из потоков обработки изображений, поэтому
+    изменения и чтение серий идут под блокировкой.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        # {значения меток: [счетчики корзин..., +Inf, сумма]}
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in snapshot:
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, le)} {total}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {total}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("queries", "rows", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+
+
+# Счетчики текущего запроса; ветки fanout наследуют тот же объект
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Metrics:
+    """
+    Метрики горячих путей: задержка и размер ответов по маршрутам,
+    число запросов к базе и прочитанных строк на один HTTP-запрос,
+    время SQL-запросов и обработки изображений. Пока `enabled` ложно,
+    ни middleware, ни обработчики событий SQLAlchemy не подключены.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "Время обработки HTTP-запроса",
+            LATENCY_BUCKETS,
+            ("method", "route", "status"),
+        )
+        self.response_bytes = Histogram(
+            "http_response_size_bytes",
+            "Размер тела ответа после сжатия",
+            BYTE_BUCKETS,
+            ("method", "route"),
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries",
+            "Число SQL-запросов на один HTTP-запрос",
+            QUERY_COUNT_BUCKETS,
+            ("method", "route"),
+        )
+        self.request_rows = Histogram(
+            "http_request_db_rows",
+            "Число строк, прочитанных из базы за один HTTP-запрос",
+            ROW_BUCKETS,
+            ("method", "route"),
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds",
+            "Суммарное время SQL-запросов одного HTTP-запроса",
+            LATENCY_BUCKETS,
+            ("method", "route"),
+        )
+        self.query_duration = Histogram(
+            "db_query_duration_seconds",
+            "Время выполнения одного SQL-запроса",
+            LATENCY_BUCKETS,
+        )
+        self.image_duration = Histogram(
+            "image_processing_seconds",
+            "Время обработки одного изображения в пуле потоков",
+            LATENCY_BUCKETS,
+        )
+
+    def histograms(self) -> Tuple[Histogram, ...]:
+        return (
+            self.request_duration,
+            self.response_bytes,
+            self.request_queries,
+            self.request_rows,
+            self.request_db_time,
+            self.query_duration,
+            self.image_duration,
+        )
+
+    def observe_request(
+        self, method: str, route: str, status: int, elapsed: float, size: int, stats: RequestStats
+    ):
+        self.request_duration.observe(elapsed, method, route, str(status))
+        self.response_bytes.observe(size, method, route)
+        self.request_queries.observe(stats.queries, method, route)
+        self.request_rows.observe(stats.rows, method, route)
+        self.request_db_time.observe(stats.db_time, method, route)
+
+    def observe_image(self, elapsed: float):
+        if self.enabled:
+            self.image_duration.observe(elapsed)
+
+    def render(self) -> str:
+        from database.session import engine
+
+        lines = []
+        for histogram in self.histograms():
+            lines += histogram.render()
+
+        pool = engine.pool.stats()
+        for name, key, help in (
+            ("db_pool_checked_out", "checked_out", "Занятые соединения пула"),
+            ("db_pool_overflow", "overflow", "Соединения сверх DB_POOL_SIZE"),
+            ("db_pool_waiting", "waiting", "Запросы, ожидающие свободное соединение"),
+        ):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {pool[key]}"]
+        lines += [
+            "# HELP db_pool_timeouts_total Ошибки ожидания соединения",
+            "# TYPE db_pool_timeouts_total counter",
+            f"db_pool_timeouts_total {pool['timeouts']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def route_label(scope: Scope) -> str:
+    # Шаблон пути, а не сам путь: /api/products/{product_id}
+    route = scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            self.registry.observe_request(
+                scope["method"], route_label(scope), status, elapsed, size, stats
+            )
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    metrics.query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        # Для SELECT rowcount — число полученных строк
+        if cursor.description is not None and cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+
+
+def handle_error(context):
+    # after_cursor_execute не вызывается для упавшего запроса: снимаем его
+    # время начала, иначе следующий запрос соединения возьмет чужое
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def install(app, engine):
+    """Подключает сбор метрик, если METRICS_ENABLED; иначе ничего не делает."""
+    if not settings.METRICS_ENABLED:
+        return
+    metrics.enabled = True
+    instrument_engine(engine.sync_engine)
+    app.add_middleware(MetricsMiddleware)
+
+
+router = APIRouter(tags=["internal"])
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики Prometheus",
+    description="Гистограммы задержек, SQL-запросов, размеров ответов и обработки изображений в текстовом формате Prometheus. Доступно при METRICS_ENABLED",
+    response_class=PlainTextResponse,
+    status_code=200,
+)
+async def get_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+
+from config.config import settings
+
+from .compression import compress, supported_encodings
+
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Максимальное сжатие: делается один раз при сборке, а не на каждый запрос
+LEVELS = {"br": 11, "gzip": 9}
+
+
+def manifest_files(static_folder: str):
+    with open(os.path.join(static_folder, "asset-manifest.json"), encoding="utf-8") as file:
+        manifest = json.load(file)
+    for url in manifest.get("files", {}).values():
+        # "/static/js/main.js" -> "{static_folder}/js/main.js"
+        relative = url.lstrip("/")
+        if relative.startswith("static/"):
+            relative = relative[len("static/"):]
+        yield os.path.join(static_folder, relative)
+
+
+def precompress(static_folder: str) -> int:
+    written = 0
+    for path in manifest_files(static_folder):
+        if not os.path.isfile(path):
+            print(f"Skip {path}: not found")
+            continue
+        source_mtime = os.path.getmtime(path)
+        data = None
+        for encoding in supported_encodings():
+            target = path + SUFFIXES[encoding]
+            if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+                continue
+            if data is None:
+                with open(path, "rb") as file:
+                    data = file.read()
+            compressed = compress(data, encoding, LEVELS[encoding])
+            with open(target, "wb") as file:
+                file.write(compressed)
+            print(f"{target}: {len(data)} -> {len(compressed)} bytes")
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    # python -m api.precompress [папка статики]
+    folder = sys.argv[1] if len(sys.argv) > 1 else settings.STATIC_FOLDER
+    print(f"Files written: {precompress(folder)}")
@@ -0,0 +1,160 @@
+import time
+import random
+import logging
+import secrets
+import itertools
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.config import settings
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # без pyinstrument профилирование недоступно
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile-token"
+
+
+def token_matches(value: Optional[str]) -> bool:
+    token = settings.PROFILING_TOKEN
+    if token is None or not value:
+        return False
+    return secrets.compare_digest(value.encode(), token.get_secret_value().encode())
+
+
+class ProfileStore:
+    """Последние `size` сохраненных профилей; старые вытесняются новыми."""
+
+    def __init__(self, size: int):
+        self._profiles: "deque[Tuple[Dict[str, Any], Any]]" = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self.profiled = 0
+        self.kept = 0
+
+    def add(self, meta: Dict[str, Any], session: Any) -> int:
+        meta["id"] = next(self._ids)
+        self._profiles.append((meta, session))
+        self.kept += 1
+        return meta["id"]
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [meta for meta, _ in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Tuple[Dict[str, Any], Any]]:
+        for meta, session in self._profiles:
+            if meta["id"] == profile_id:
+                return meta, session
+        return None
+
+
+profile_store = ProfileStore(settings.PROFILING_BUFFER_SIZE)
+
+
+def render_profile(session: Any, format: str) -> str:
+    if format == "speedscope":
+        return SpeedscopeRenderer().render(session)
+    return HTMLRenderer().render(session)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы сэмплирующим профилировщиком pyinstrument
+    (учитывает await: время ожидания базы видно как ожидание в обработчике).
+    Профилируется доля запросов `sample_rate`, а сохраняются только те,
+    что длились дольше `threshold` секунд. Запрос с заголовком
+    X-Profile-Token, равным PROFILING_TOKEN, профилируется и сохраняется
+    всегда, даже при выключенном PROFILING_ENABLED.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        enabled: bool = True,
+        threshold: float = 0.5,
+        sample_rate: float = 0.01,
+        interval: float = 0.001,
+        store: ProfileStore = profile_store,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith("/internal/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        forced = token_matches(Headers(scope=scope).get(PROFILE_HEADER))
+        sampled = self.enabled and random.random() < self.sample_rate
+        if not forced and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        self.store.profiled += 1
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            elapsed = time.perf_counter() - started
+            if forced or elapsed >= self.threshold:
+                route = scope.get("route")
+                query = scope.get("query_string", b"").decode("latin-1")
+                self.store.add(
+                    {
+                        "method": scope["method"],
+                        "path": scope["path"] + (f"?{query}" if query else ""),
+                        "route": getattr(route, "path", None),
+                        "status": status,
+                        "duration": elapsed,
+                        "started_at": started_at.isoformat(),
+                        "forced": forced,
+                    },
+                    session,
+                )
+
+
+def install(app):
+    """Подключает профилирование, если оно включено или задан PROFILING_TOKEN."""
+    if not settings.PROFILING_ENABLED and settings.PROFILING_TOKEN is None:
+        return
+    if Profiler is None:
+        logger.warning("pyinstrument is not installed, request profiling is disabled")
+        return
+    app.add_middleware(
+        ProfilingMiddleware,
+        enabled=settings.PROFILING_ENABLED,
+        threshold=settings.PROFILING_THRESHOLD,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval=settings.PROFILING_INTERVAL,
+    )
+
+
+def require_profile_token(request: Request):
+    # Токен в заголовке или, для просмотра в браузере, в параметре token
+    value = request.headers.get(PROFILE_HEADER) or request.query_params.get("token")
+    if not token_matches(value):
+        raise HTTPException(status_code=401, detail="Invalid profile token")
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import ProductRatingStats
+
+RATES = range(1, 6)
+COUNTERS = ("count", "sum") + tuple(f"rate_{rate}" for rate in RATES)
+
+
+async def apply_rating_changes(
+    session: AsyncSession, changes: Iterable[Tuple[int, int, int]]
+):
+    """
+    Обновляет product_rating_stats для изменений отзывов `(product_id, rate, sign)`:
+    sign = 1 — отзыв добавлен, -1 — удален. Вызывается в транзакции,
+    которая меняет отзывы, одним запросом на все затронутые товары.
+    """
+    deltas: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for product_id, rate, sign in changes:
+        delta = deltas[product_id]
+        delta["count"] += sign
+        delta["sum"] += sign * rate
+        if rate in RATES:
+            delta[f"rate_{rate}"] += sign
+    if not deltas:
+        return
+
+    stmt = insert(ProductRatingStats).values(
+        [{"product_id": product_id, **delta} for product_id, delta in deltas.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductRatingStats.product_id],
+        set_={
+            name: getattr(ProductRatingStats, name) + getattr(stmt.excluded, name)
+            for name in COUNTERS
+        },
+    )
+    await session.execute(stmt)
+
+
+def rating_summary(count: Optional[int], total: Optional[int]) -> Dict[str, Any]:
+    count = count or 0
+    return {
+        "count": count,
+        "average": round(total / count, 2) if count else None,
+    }
+
+
+def rating_details(stats: Optional[ProductRatingStats]) -> Dict[str, Any]:
+    if stats is None:
+        return {**rating_summary(0, 0), "histogram": {str(rate): 0 for rate in RATES}}
+    return {
+        **rating_summary(stats.count, stats.sum),
+        "histogram": {str(rate): getattr(stats, f"rate_{rate}") for rate in RATES},
+    }
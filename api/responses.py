@@ -0,0 +1,20 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+
+
+def encode_json(payload: Any) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+
+class JSONBytesResponse(Response):
+    """
+    Ответ с уже закодированным JSON. Обработчик, вернувший его, минует
+    jsonable_encoder и повторную сериализацию.
+    """
+
+    media_type = "application/json"
+
+
+__all__ = ["ORJSONResponse", "JSONBytesResponse", "encode_json"]
@@ -1,12 +1,15 @@
+import re
 import uuid
 import asyncio
-
-from fastapi_cache import FastAPICache
-from fastapi_cache.decorator import cache
-from fastapi_cache.backends.redis import RedisBackend
-
-from fastapi import APIRouter, Depends, Body, HTTPException, File, UploadFile
-from sqlalchemy import select, insert, update, text, delete, join
+import functools
+
+from fastapi import APIRouter, Depends, Body, HTTPException, File, UploadFile, Query, Request
+from fastapi.responses import StreamingResponse
+from fastapi import Response
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, text, delete, join, func, literal_column, literal, or_
+from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_
 from sqlalchemy import case
@@ -19,6 +22,7 @@ from database.session import get_async_session
 from database.models import (
     Products,
     Reviews,
+    ProductRatingStats,
     Colors,
     Forms,
     Category,
@@ -26,6 +30,9 @@ from database.models import (
     Metatags,
     PreCategoryProducts,
     product_precategory_association,
+    product_form_association,
+    product_color_association,
+    category_precategory_association,
 )
 
 from config.config import settings
@@ -43,132 +50,671 @@ from .schemas import (
     MetatagsSchemaPath,
     MetatagsResponse,
 )
-from .utils import save_img, random_id, get_static_img_url
+from .utils import random_id
+from .urls import static_urls
+from .blobs import store_images, release, remove_orphans
+from .catalog import catalog_snapshot
+from .responses import ORJSONResponse, JSONBytesResponse, encode_json
+from .export import EXPORT_FORMATS
+from .fanout import fanout
+from .ratings import apply_rating_changes, rating_summary, rating_details
+from .metatags import metatag_resolver, encode_with_etag, etag_matches
+from .cache import (
+    TTL,
+    PRODUCTS,
+    CATEGORY,
+    PRECATEGORY,
+    COLORS,
+    FORMS,
+    REVIEWS,
+    cached,
+    cached_response,
+    invalidate,
+)
 
-router = APIRouter(prefix="/api", tags=["api"])
+router = APIRouter(prefix="/api", tags=["api"], default_response_class=ORJSONResponse)
 
 
-@router.get(
-    "/products",
-    summary="Получение всех продуктов",
-    description="Получает товары, их цвета, формы и предкатегории из таблиц Products, Colors, Forms, и PreCategoryProducts.",
-    status_code=200,
+PRODUCT_FIELDS = (
+    "name", "desc", "images", "isFrom", "price", "options", "preCategory", "rating"
 )
-async def get_products(session: AsyncSession = Depends(get_async_session)):
-    async with session:
-       
-        products_stmt = select(
-            Products.id,
-            Products.ru_name_name,
-            Products.ru_name_desc,
-            Products.en_name_name,
-            Products.en_name_desc,
-            Products.images,
-            Products.isFrom,
-            Products.price_ru,
-            Products.price_en,
-            Products.options_isForm,
-            Products.options_isColor,
-            Products.options_formId,
-            Products.options_colorId,
-        )
-        color_stmt = select(Colors.id, Colors.ru_name, Colors.en_name, Colors.rgb)
-        form_stmt = select(
-            Forms.id, Forms.ru_name, Forms.en_name, Forms.changeForm, Forms.image
-        )
 
 
-        precategory_stmt = select(
-            PreCategoryProducts.id,
-            PreCategoryProducts.address,
-            PreCategoryProducts.ru_name,
-            PreCategoryProducts.en_name,
-            product_precategory_association.c.product_id,
-        ).join(
-            product_precategory_association,
-            PreCategoryProducts.id == product_precategory_association.c.precategory_id,
+def parse_product_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return PRODUCT_FIELDS
+    requested = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in requested if field not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown product fields: {', '.join(unknown)}"
         )
-
-
-        products_result = await session.execute(products_stmt)
-        color_result = await session.execute(color_stmt)
-        form_result = await session.execute(form_stmt)
-        precategory_result = await session.execute(precategory_stmt)
-
-
-        color_data = {
-            row.id: {
+    return requested
+
+
+async def load_product_colors(
+    session: AsyncSession, product_ids: Optional[List[int]] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    # Цвета товаров в порядке выбора; product_ids=None — для всех товаров
+    stmt = (
+        select(
+            product_color_association.c.product_id,
+            Colors.id,
+            Colors.ru_name,
+            Colors.en_name,
+            Colors.rgb,
+        )
+        .join(Colors, Colors.id == product_color_association.c.color_id)
+        .order_by(product_color_association.c.position)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(product_color_association.c.product_id.in_(product_ids))
+
+    color_data = {}
+    for row in await session.execute(stmt):
+        color_data.setdefault(row.product_id, []).append(
+            {
                 "id": row.id,
                 "ru_name": row.ru_name,
                 "en_name": row.en_name,
                 "rgb": row.rgb,
             }
-            for row in color_result.scalars()
-        }
-
-
-        form_data = {
-            row.id: {
+        )
+    return color_data
+
+
+async def load_product_forms(
+    session: AsyncSession, product_ids: Optional[List[int]] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    stmt = (
+        select(
+            product_form_association.c.product_id,
+            Forms.id,
+            Forms.ru_name,
+            Forms.en_name,
+            Forms.changeForm,
+            Forms.image,
+        )
+        .join(Forms, Forms.id == product_form_association.c.form_id)
+        .order_by(product_form_association.c.position)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(product_form_association.c.product_id.in_(product_ids))
+
+    form_data = {}
+    for row in await session.execute(stmt):
+        form_data.setdefault(row.product_id, []).append(
+            {
                 "id": row.id,
                 "ru_name": row.ru_name,
                 "en_name": row.en_name,
                 "changeForm": row.changeForm,
-                "image": await get_static_img_url(row.image),
+                "image": static_urls.url(row.image),
+                "srcset": static_urls.srcset(row.image),
             }
-            for row in form_result.scalars()
-        }
+        )
+    return form_data
+
+
+async def load_product_precategories(
+    session: AsyncSession, product_ids: Optional[List[int]] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    stmt = select(
+        PreCategoryProducts.id,
+        PreCategoryProducts.address,
+        PreCategoryProducts.ru_name,
+        PreCategoryProducts.en_name,
+        product_precategory_association.c.product_id,
+    ).join(
+        product_precategory_association,
+        PreCategoryProducts.id == product_precategory_association.c.precategory_id,
+    )
+    if product_ids is not None:
+        stmt = stmt.where(product_precategory_association.c.product_id.in_(product_ids))
+
+    precategory_data = {}
+    for row in await session.execute(stmt):
+        precategory_data.setdefault(row.product_id, []).append(
+            {
+                "id": row.id,
+                "address": row.address,
+                "ru_name": row.ru_name,
+                "en_name": row.en_name,
+            }
+        )
+    return precategory_data
+
+
+async def load_products(
+    session: AsyncSession,
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    fields: Tuple[str, ...] = PRODUCT_FIELDS,
+    precategory: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    is_from: Optional[bool] = None,
+    form_id: Optional[int] = None,
+    color_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Возвращает страницу товаров (keyset по Products.id) и курсор следующей
+    страницы. Цвета, формы и предкатегории загружаются только для товаров
+    на странице и только если они попали в `fields`; эти запросы
+    выполняются параллельно через `fanout`.
+    """
+    async with session:
+        columns = [Products.id]
+        if "name" in fields:
+            columns += [Products.ru_name_name, Products.en_name_name]
+        if "desc" in fields:
+            columns += [Products.ru_name_desc, Products.en_name_desc]
+        if "images" in fields:
+            columns.append(Products.images)
+        if "isFrom" in fields:
+            columns.append(Products.isFrom)
+        if "price" in fields:
+            columns += [Products.price_ru, Products.price_en]
+        if "options" in fields:
+            columns += [Products.options_isForm, Products.options_isColor]
+
+        if "rating" in fields:
+            columns += [
+                ProductRatingStats.count.label("rating_count"),
+                ProductRatingStats.sum.label("rating_sum"),
+            ]
 
-  
-        precategory_data = {}
-        for row in precategory_result:
-            product_id = row.product_id
-            if product_id not in precategory_data:
-                precategory_data[product_id] = []
-            precategory_data[product_id].append(
-                {
-                    "id": row.id,
-                    "address": row.address,
-                    "ru_name": row.ru_name,
-                    "en_name": row.en_name,
-                }
+        products_stmt = select(*columns).select_from(Products).order_by(Products.id)
+        if "rating" in fields:
+            products_stmt = products_stmt.outerjoin(
+                ProductRatingStats, ProductRatingStats.product_id == Products.id
             )
-
- 
-        products = []
-        for row in products_result.all():
-            form_ids = (
-                [int(id_) for id_ in row.options_formId] if row.options_formId else []
+        if cursor is not None:
+            products_stmt = products_stmt.where(Products.id > cursor)
+        if price_min is not None:
+            products_stmt = products_stmt.where(Products.price_ru >= price_min)
+        if price_max is not None:
+            products_stmt = products_stmt.where(Products.price_ru <= price_max)
+        if is_from is not None:
+            products_stmt = products_stmt.where(Products.isFrom == is_from)
+        if form_id is not None:
+            products_stmt = products_stmt.where(
+                Products.id.in_(
+                    select(product_form_association.c.product_id).where(
+                        product_form_association.c.form_id == form_id
+                    )
+                )
             )
-            color_ids = (
-                [int(id_) for id_ in row.options_colorId] if row.options_colorId else []
+        if color_id is not None:
+            products_stmt = products_stmt.where(
+                Products.id.in_(
+                    select(product_color_association.c.product_id).where(
+                        product_color_association.c.color_id == color_id
+                    )
+                )
             )
+        if precategory is not None:
+            products_stmt = products_stmt.where(
+                Products.id.in_(
+                    select(product_precategory_association.c.product_id)
+                    .join(
+                        PreCategoryProducts,
+                        PreCategoryProducts.id
+                        == product_precategory_association.c.precategory_id,
+                    )
+                    .where(PreCategoryProducts.address == precategory)
+                )
+            )
+        if limit is not None:
+            # Лишняя строка показывает, есть ли следующая страница
+            products_stmt = products_stmt.limit(limit + 1)
+
+        # Без фильтров страница — это весь каталог, IN по всем id не нужен
+        filters = (limit, cursor, precategory, price_min, price_max, is_from, form_id, color_id)
+        filtered = any(value is not None for value in filters)
+
+        linked = {}
+        if "options" in fields:
+            linked["colors"] = load_product_colors
+            linked["forms"] = load_product_forms
+        if "preCategory" in fields:
+            linked["precategories"] = load_product_precategories
+
+        async def fetch_rows(branch_session: AsyncSession):
+            return (await branch_session.execute(products_stmt)).all()
+
+        if filtered:
+            # Связанные строки нужны только для товаров страницы
+            rows = await fetch_rows(session)
+
+            next_cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = rows[-1].id
+
+            product_ids = [row.id for row in rows]
+            # Соединение запроса возвращается в пул до того, как ветки fanout
+            # займут свои: запрос не держит одно соединение, ожидая другие
+            await session.close()
+            branches = {
+                name: functools.partial(load, product_ids=product_ids)
+                for name, load in linked.items()
+            }
+            data = await fanout(session, branches) if rows else {}
+        else:
+            # Весь каталог: товары и связанные строки не зависят друг от друга
+            # и читаются одновременно на разных соединениях
+            data = await fanout(session, {"rows": fetch_rows, **linked})
+            rows = data["rows"]
+            next_cursor = None
+
+        color_data = data.get("colors", {})
+        form_data = data.get("forms", {})
+        precategory_data = data.get("precategories", {})
 
-            form_data_ = [form_data[id_] for id_ in form_ids if id_ in form_data]
-            color_data_ = [color_data[id_] for id_ in color_ids if id_ in color_data]
-
-            product = {
-                "id": row.id,
-                "ru_name": {"name": row.ru_name_name, "desc": row.ru_name_desc},
-                "en_name": {"name": row.en_name_name, "desc": row.en_name_desc},
-                "images": [await get_static_img_url(img) for img in row.images],
-                "isFrom": row.isFrom,
-                "price": {"ru_name": row.price_ru, "en_name": row.price_en},
-                "options": {
+        products = []
+        for row in rows:
+            product = {"id": row.id}
+            if "name" in fields or "desc" in fields:
+                ru_name = {}
+                en_name = {}
+                if "name" in fields:
+                    ru_name["name"] = row.ru_name_name
+                    en_name["name"] = row.en_name_name
+                if "desc" in fields:
+                    ru_name["desc"] = row.ru_name_desc
+                    en_name["desc"] = row.en_name_desc
+                product["ru_name"] = ru_name
+                product["en_name"] = en_name
+            if "images" in fields:
+                product["images"], product["srcset"] = static_urls.images(row.images)
+            if "isFrom" in fields:
+                product["isFrom"] = row.isFrom
+            if "price" in fields:
+                product["price"] = {"ru_name": row.price_ru, "en_name": row.price_en}
+            if "options" in fields:
+                product["options"] = {
                     "isForm": row.options_isForm,
                     "isColor": row.options_isColor,
-                    "form": form_data_,
-                    "color": color_data_,
-                },
-                "preCategory": precategory_data.get(
-                    row.id, []
-                ),  
-            }
+                    "form": form_data.get(row.id, []),
+                    "color": color_data.get(row.id, []),
+                }
+            if "preCategory" in fields:
+                product["preCategory"] = precategory_data.get(row.id, [])
+            if "rating" in fields:
+                product["rating"] = rating_summary(row.rating_count, row.rating_sum)
             products.append(product)
 
-        if not products:
+        return products, next_cursor
+
+
+async def link_options(
+    session: AsyncSession, options: Dict[int, Tuple[List[int], List[int]]]
+):
+    """
+    Записывает связи товаров с формами и цветами: `options` —
+    {product_id: (form_ids, color_ids)}. Порядок списков сохраняется в
+    position, несуществующие и повторяющиеся id пропускаются.
+    """
+    all_form_ids = {id_ for form_ids, _ in options.values() for id_ in form_ids}
+    all_color_ids = {id_ for _, color_ids in options.values() for id_ in color_ids}
+    existing_forms = set()
+    existing_colors = set()
+    if all_form_ids:
+        existing_forms = set(
+            (await session.execute(select(Forms.id).where(Forms.id.in_(all_form_ids)))).scalars()
+        )
+    if all_color_ids:
+        existing_colors = set(
+            (await session.execute(select(Colors.id).where(Colors.id.in_(all_color_ids)))).scalars()
+        )
+
+    form_links = []
+    color_links = []
+    for product_id, (form_ids, color_ids) in options.items():
+        for position, form_id in enumerate(dict.fromkeys(form_ids)):
+            if form_id in existing_forms:
+                form_links.append(
+                    {"product_id": product_id, "form_id": form_id, "position": position}
+                )
+        for position, color_id in enumerate(dict.fromkeys(color_ids)):
+            if color_id in existing_colors:
+                color_links.append(
+                    {"product_id": product_id, "color_id": color_id, "position": position}
+                )
+
+    if form_links:
+        await session.execute(insert(product_form_association), form_links)
+    if color_links:
+        await session.execute(insert(product_color_association), color_links)
+
+
+async def upsert_precategories(
+    session: AsyncSession, precategories: List[PreCategorySchema]
+) -> Dict[Tuple[str, str, str], int]:
+    """
+    Одним запросом находит или создает предкатегории товаров и возвращает
+    {(address, ru_name, en_name): id}.
+    """
+    # Строки блокируются в порядке VALUES: один порядок во всех транзакциях
+    # (как в blobs.acquire), чтобы параллельные импорты не ждали друг друга
+    # по кругу
+    keys = sorted({(item.address, item.ru_name, item.en_name) for item in precategories})
+    if not keys:
+        return {}
+    stmt = pg_insert(PreCategoryProducts).values(
+        [
+            {"address": address, "ru_name": ru_name, "en_name": en_name}
+            for address, ru_name, en_name in keys
+        ]
+    )
+    # DO UPDATE без изменений нужен, чтобы RETURNING вернул и уже существующие строки
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_preCategoryProducts_address_names",
+        set_={"address": stmt.excluded.address},
+    ).returning(
+        PreCategoryProducts.id,
+        PreCategoryProducts.address,
+        PreCategoryProducts.ru_name,
+        PreCategoryProducts.en_name,
+    )
+    result = await session.execute(stmt)
+    return {(row.address, row.ru_name, row.en_name): row.id for row in result}
+
+
+async def import_products(session: AsyncSession, products: List[ProductSchema]) -> int:
+    """
+    Пакетная запись товаров: предкатегории, товары и все связи
+    записываются несколькими запросами на весь пакет, а не по строке.
+    """
+    if not products:
+        return 0
+
+    precategory_ids = await upsert_precategories(
+        session, [category for product in products for category in product.preCategory]
+    )
+
+    insert_data = []
+    precategory_links = []
+    for product in products:
+        product_id = random_id(100)
+        insert_data.append(
+            {
+                "id": product_id,
+                "ru_name_name": product.ru_name.name,
+                "ru_name_desc": product.ru_name.desc,
+                "en_name_name": product.en_name.name,
+                "en_name_desc": product.en_name.desc,
+                "images": product.images,
+                "isFrom": product.isFrom,
+                "price_ru": product.price.ru_name,
+                "price_en": product.price.en_name,
+                "options_isForm": product.options.isForm,
+                "options_isColor": product.options.isColor,
+                "options_formId": product.options.form_ids,
+                "options_colorId": product.options.color_ids,
+            }
+        )
+        keys = dict.fromkeys(
+            (category.address, category.ru_name, category.en_name)
+            for category in product.preCategory
+        )
+        precategory_links += [
+            {"product_id": product_id, "precategory_id": precategory_ids[key]} for key in keys
+        ]
+
+    # Изображения всех товаров пакета сохраняются одним вызовом:
+    # повторяющиеся картинки записываются на диск один раз
+    all_images = [img for data in insert_data for img in data["images"]]
+    stored_paths = iter(await store_images(session, all_images))
+    for data in insert_data:
+        data["images"] = [next(stored_paths) for _ in data["images"]]
+
+    await session.execute(insert(Products), insert_data)
+    await link_options(
+        session,
+        {data["id"]: (data["options_formId"], data["options_colorId"]) for data in insert_data},
+    )
+    if precategory_links:
+        await session.execute(insert(product_precategory_association), precategory_links)
+    return len(insert_data)
+
+
+async def link_precategories(session: AsyncSession, links: Dict[int, List[int]]):
+    """
+    Записывает пункты меню категорий: `links` — {category_id: precategory_ids}.
+    Порядок сохраняется в position, несуществующие и повторяющиеся id
+    пропускаются.
+    """
+    all_ids = {id_ for precategory_ids in links.values() for id_ in precategory_ids}
+    if not all_ids:
+        return
+    existing = set(
+        (await session.execute(select(PreCategory.id).where(PreCategory.id.in_(all_ids)))).scalars()
+    )
+    rows = [
+        {"category_id": category_id, "precategory_id": precategory_id, "position": position}
+        for category_id, precategory_ids in links.items()
+        for position, precategory_id in enumerate(dict.fromkeys(precategory_ids))
+        if precategory_id in existing
+    ]
+    if rows:
+        await session.execute(insert(category_precategory_association).values(rows))
+
+
+async def build_products_payload(session: AsyncSession) -> Dict[str, Any]:
+    products, _ = await load_products(session)
+    return {"Products": products}
+
+
+@router.get(
+    "/products",
+    summary="Получение всех продуктов",
+    description=(
+        "Получает товары, их цвета, формы и предкатегории из таблиц Products, Colors, Forms, и PreCategoryProducts.\n"
+        "Без параметров возвращает весь каталог. `limit`/`cursor` включают постраничную выдачу "
+        "(курсор следующей страницы возвращается в `next_cursor`), `fields` — список полей через запятую "
+        f"({', '.join(PRODUCT_FIELDS)}), `preCategory` — адрес предкатегории, "
+        "`price_min`/`price_max` — диапазон цены в рублях, `isFrom` — фильтр по признаку «от», "
+        "`form_id`/`color_id` — товары с выбранной формой или цветом."
+    ),
+    status_code=200,
+)
+async def get_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[int] = None,
+    fields: Optional[str] = None,
+    preCategory: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    isFrom: Optional[bool] = None,
+    form_id: Optional[int] = None,
+    color_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    filters = (
+        limit, cursor, fields, preCategory, price_min, price_max, isFrom, form_id, color_id
+    )
+    # Полный каталог отдается из снимка и в общий кэш ответов не пишется:
+    # снимок воркера мог отстать, и кэш разнес бы устаревший ответ по всем
+    if all(value is None for value in filters):
+        payload, body = await catalog_snapshot.get(
+            lambda: build_products_payload(session)
+        )
+        if not payload["Products"]:
             raise HTTPException(status_code=404, detail="Products not found")
 
-        return {"Products": products}
+        return JSONBytesResponse(body)
+
+    async def build() -> bytes:
+        products, next_cursor = await load_products(
+            session,
+            limit=limit,
+            cursor=cursor,
+            fields=parse_product_fields(fields),
+            precategory=preCategory,
+            price_min=price_min,
+            price_max=price_max,
+            is_from=isFrom,
+            form_id=form_id,
+            color_id=color_id,
+        )
+        return encode_json({"Products": products, "next_cursor": next_cursor})
+
+    return JSONBytesResponse(await cached_response(request, PRODUCTS, TTL[PRODUCTS], build))
+
+
+def json_agg_ordered(*pairs, order_by):
+    # json_agg(json_build_object(...) ORDER BY ...) или '[]', если строк нет
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(func.json_build_object(*pairs), order_by)),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    )
+
+
+def linked_rows_json(association, key, model, *fields):
+    """
+    Коррелированный подзапрос: JSON-массив строк `model`, связанных с
+    товаром через таблицу `association`, в порядке выбора (position).
+    """
+    pairs = []
+    for field in fields:
+        pairs += [literal_column(f"'{field}'"), getattr(model, field)]
+    return (
+        select(json_agg_ordered(*pairs, order_by=association.c.position))
+        .select_from(association.join(model, model.id == association.c[key]))
+        .where(association.c.product_id == Products.id)
+        .scalar_subquery()
+    )
+
+
+@router.get(
+    "/products/export",
+    summary="Выгрузка каталога",
+    description=(
+        "Потоково выгружает весь каталог: `format=ndjson` — по одному товару в формате "
+        "GET /api/products на строку, `format=csv` — плоская таблица. Строки читаются "
+        "из серверного курсора, поэтому память не растет с размером каталога."
+    ),
+    status_code=200,
+)
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    generate, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        generate(session),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+# lang -> (конфигурация текстового поиска, tsvector, название, описание, цена)
+SEARCH_LANGUAGES = {
+    "ru": (
+        "russian",
+        Products.search_ru,
+        Products.ru_name_name,
+        Products.ru_name_desc,
+        Products.price_ru,
+    ),
+    "en": (
+        "english",
+        Products.search_en,
+        Products.en_name_name,
+        Products.en_name_desc,
+        Products.price_en,
+    ),
+}
+HEADLINE_NAME = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+HEADLINE_DESC = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+
+def prefix_tsquery(q: str) -> Optional[str]:
+    # "красн стул" -> "красн:* & стул:*": строка поиска набирается по буквам,
+    # поэтому последнее (и любое) слово ищется по префиксу
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+@router.get(
+    "/products/search",
+    summary="Поиск товаров",
+    description=(
+        "Полнотекстовый поиск по названию и описанию на языке `lang` (ru/en) с поиском "
+        "по началу слов и нечетким совпадением названия (pg_trgm) для опечаток. "
+        "Возвращает одну страницу результатов по убыванию релевантности: id, название, "
+        "цену, первое изображение и подсветку совпадений (<mark>)."
+    ),
+    status_code=200,
+)
+@cached(PRODUCTS)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    lang: str = Query("ru", pattern="^(ru|en)$"),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    session: AsyncSession = Depends(get_async_session),
+):
+    tsquery_text = prefix_tsquery(q)
+    if tsquery_text is None:
+        return {"Products": [], "next_offset": None}
+
+    config, document, name, desc, price = SEARCH_LANGUAGES[lang]
+    regconfig = literal_column(f"'{config}'::regconfig")
+    query = func.to_tsquery(regconfig, tsquery_text)
+
+    async with session:
+        # Сначала ранжируется только страница id, подсветка (ts_headline)
+        # считается уже для нее
+        rank = (func.ts_rank_cd(document, query) + func.word_similarity(q, name)).label("rank")
+        page = (
+            select(Products.id, rank)
+            .where(or_(document.op("@@")(query), literal(q).op("<%")(name)))
+            .order_by(rank.desc(), Products.id)
+            .limit(limit + 1)
+            .offset(offset)
+            .subquery()
+        )
+        stmt = (
+            select(
+                page.c.id,
+                page.c.rank,
+                name.label("name"),
+                price.label("price"),
+                Products.images,
+                func.ts_headline(regconfig, name, query, HEADLINE_NAME).label("name_highlight"),
+                func.ts_headline(regconfig, desc, query, HEADLINE_DESC).label("desc_highlight"),
+            )
+            .join(Products, Products.id == page.c.id)
+            .order_by(page.c.rank.desc(), page.c.id)
+        )
+        rows = (await session.execute(stmt)).all()
+
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+
+    products = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "price": row.price,
+            "image": static_urls.url(row.images[0]) if row.images else None,
+            "highlight": {"name": row.name_highlight, "desc": row.desc_highlight},
+            "rank": round(row.rank, 4),
+        }
+        for row in rows
+    ]
+    return {"Products": products, "next_offset": next_offset}
+
 
 @router.get(
     "/products/{product_id}",
@@ -176,9 +722,31 @@ async def get_products(session: AsyncSession = Depends(get_async_session)):
     description="Получает товар, его цвета, формы и предкатегории из таблиц Products, Colors, Forms, и PreCategoryProducts по указанному ID.",
     status_code=200,
 )
+@cached(PRODUCTS)
 async def get_product_by_id(product_id: int, session: AsyncSession = Depends(get_async_session)):
     async with session:
- 
+        # Один запрос: цвета, формы и предкатегории собираются в JSON на стороне
+        # PostgreSQL через таблицы связей товара
+        precategories = (
+            select(
+                json_agg_ordered(
+                    literal_column("'id'"), PreCategoryProducts.id,
+                    literal_column("'address'"), PreCategoryProducts.address,
+                    literal_column("'ru_name'"), PreCategoryProducts.ru_name,
+                    literal_column("'en_name'"), PreCategoryProducts.en_name,
+                    order_by=PreCategoryProducts.id,
+                )
+            )
+            .select_from(
+                product_precategory_association.join(
+                    PreCategoryProducts,
+                    PreCategoryProducts.id == product_precategory_association.c.precategory_id,
+                )
+            )
+            .where(product_precategory_association.c.product_id == Products.id)
+            .scalar_subquery()
+        )
+
         product_stmt = select(
             Products.id,
             Products.ru_name_name,
@@ -191,103 +759,115 @@ async def get_product_by_id(product_id: int, session: AsyncSession = Depends(get
             Products.price_en,
             Products.options_isForm,
             Products.options_isColor,
-            Products.options_formId,
-            Products.options_colorId,
+            linked_rows_json(
+                product_color_association, "color_id", Colors, "id", "ru_name", "en_name", "rgb"
+            ).label("colors"),
+            linked_rows_json(
+                product_form_association,
+                "form_id",
+                Forms,
+                "id",
+                "ru_name",
+                "en_name",
+                "changeForm",
+                "image",
+            ).label("forms"),
+            precategories.label("precategories"),
+            ProductRatingStats.count.label("rating_count"),
+            ProductRatingStats.sum.label("rating_sum"),
+        ).outerjoin(
+            ProductRatingStats, ProductRatingStats.product_id == Products.id
         ).where(Products.id == product_id)
 
-        color_stmt = select(Colors.id, Colors.ru_name, Colors.en_name, Colors.rgb)
-        form_stmt = select(
-            Forms.id, Forms.ru_name, Forms.en_name, Forms.changeForm, Forms.image
-        )
-
-      
-        precategory_stmt = select(
-            PreCategoryProducts.id,
-            PreCategoryProducts.address,
-            PreCategoryProducts.ru_name,
-            PreCategoryProducts.en_name,
-            product_precategory_association.c.product_id
-        ).join(
-            product_precategory_association,
-            PreCategoryProducts.id == product_precategory_association.c.precategory_id
-        ).where(product_precategory_association.c.product_id == product_id)
-
- 
         product_result = await session.execute(product_stmt)
-        color_result = await session.execute(color_stmt)
-        form_result = await session.execute(form_stmt)
-        precategory_result = await session.execute(precategory_stmt)
-
         product = product_result.first()
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
-     
-        color_data = {
-            row.id: {
-                "id": row.id,
-                "ru_name": row.ru_name,
-                "en_name": row.en_name,
-                "rgb": row.rgb,
-            }
-            for row in color_result.scalars()
-        }
-
-
-        form_data = {
-            row.id: {
-                "id": row.id,
-                "ru_name": row.ru_name,
-                "en_name": row.en_name,
-                "changeForm": row.changeForm,
-                "image": await get_static_img_url(row.image),
-            }
-            for row in form_result.scalars()
-        }
-
- 
-        precategory_data = [
+        form_data_ = [
             {
-                "id": row.id,
-                "address": row.address,
-                "ru_name": row.ru_name,
-                "en_name": row.en_name,
+                **form,
+                "image": static_urls.url(form["image"]),
+                "srcset": static_urls.srcset(form["image"]),
             }
-            for row in precategory_result
+            for form in product.forms
         ]
 
-        # Build product object
-        form_ids = [int(id_) for id_ in product.options_formId] if product.options_formId else []
-        color_ids = [int(id_) for id_ in product.options_colorId] if product.options_colorId else []
-
-        form_data_ = [form_data[id_] for id_ in form_ids if id_ in form_data]
-        color_data_ = [color_data[id_] for id_ in color_ids if id_ in color_data]
-
+        images, srcset = static_urls.images(product.images)
         product_obj = {
             "id": product.id,
             "ru_name": {"name": product.ru_name_name, "desc": product.ru_name_desc},
             "en_name": {"name": product.en_name_name, "desc": product.en_name_desc},
-            "images": [await get_static_img_url(img) for img in product.images],
+            "images": images,
+            "srcset": srcset,
             "isFrom": product.isFrom,
             "price": {"ru_name": product.price_ru, "en_name": product.price_en},
             "options": {
                 "isForm": product.options_isForm,
                 "isColor": product.options_isColor,
                 "form": form_data_,
-                "color": color_data_,
+                "color": product.colors,
             },
-            "preCategory": precategory_data,  
+            "preCategory": product.precategories,
+            "rating": rating_summary(product.rating_count, product.rating_sum),
         }
 
         return {"Product": product_obj}
 
 
+@router.get(
+    "/products/{product_id}/reviews",
+    summary="Отзывы товара",
+    description=(
+        "Возвращает отзывы товара постранично (keyset по id): `limit` — размер страницы, "
+        "`cursor` — значение `next_cursor` предыдущей страницы. В `rating` — число отзывов, "
+        "средняя оценка и гистограмма оценок 1–5 из product_rating_stats."
+    ),
+    status_code=200,
+)
+@cached(REVIEWS)
+async def get_product_reviews(
+    product_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    async with session:
+        stmt = (
+            select(Reviews.id, Reviews.ProductId, Reviews.Title, Reviews.Description, Reviews.Rate)
+            .where(Reviews.ProductId == product_id)
+            .order_by(Reviews.id)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            stmt = stmt.where(Reviews.id > cursor)
+        rows = (await session.execute(stmt)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].id
+
+        stats = await session.get(ProductRatingStats, product_id)
+        reviews = [
+            {
+                "id": row.id,
+                "Contents": {"Title": row.Title, "Description": row.Description},
+                "Rate": row.Rate,
+                "ProductId": row.ProductId,
+            }
+            for row in rows
+        ]
+        return {"reviews": reviews, "next_cursor": next_cursor, "rating": rating_details(stats)}
+
+
 @router.get(
     "/reviews",
     summary="Получение всех отзывов",
     description="Получает все отзывы из таблицы Reviews",
     status_code=200,
 )
+@cached(REVIEWS)
 async def get_reviews(session: AsyncSession = Depends(get_async_session)):
     async with session:
         try:
@@ -315,45 +895,51 @@ async def get_reviews(session: AsyncSession = Depends(get_async_session)):
     description="Получает все категории из таблицы Category",
     status_code=200,
 )
+@cached(CATEGORY)
 async def get_category(session: AsyncSession = Depends(get_async_session)):
     async with session:
         try:
+            # Все дерево меню одним запросом; формат предкатегорий тот же,
+            # что давал PreCategorySchema: без id
+            precategories = (
+                select(
+                    json_agg_ordered(
+                        literal_column("'address'"), PreCategory.address,
+                        literal_column("'ru_name'"), PreCategory.ru_name,
+                        literal_column("'en_name'"), PreCategory.en_name,
+                        order_by=category_precategory_association.c.position,
+                    )
+                )
+                .select_from(
+                    category_precategory_association.join(
+                        PreCategory,
+                        PreCategory.id == category_precategory_association.c.precategory_id,
+                    )
+                )
+                .where(category_precategory_association.c.category_id == Category.id)
+                .scalar_subquery()
+            )
             category_stmt = select(
-                Category.id, Category.ru_name, Category.en_name, Category.address, Category.preCategory
+                Category.id,
+                Category.ru_name,
+                Category.en_name,
+                Category.address,
+                precategories.label("preCategory"),
             )
             category_result = await session.execute(category_stmt)
 
-            preCategory_stmt = select(
-                PreCategory.id,
-                PreCategory.ru_name,
-                PreCategory.en_name,
-                PreCategory.address,
-            )
-            preCategory_result = await session.execute(preCategory_stmt)
-
-            preCategory_data = {
-                row[0]: PreCategorySchema(
-                    id=row[0], ru_name=row[1], en_name=row[2], address=row[3]
-                )
-                for row in preCategory_result.all()
-            }
-
-            result = category_result.all()
-            categories = []
-            for row in result:
-                preCategories = [
-                    preCategory_data[id] for id in row.preCategory if id in preCategory_data
-                ]
-                category = {
+            categories = [
+                {
                     "id": row.id,
                     "ru_name": row.ru_name,
                     "en_name": row.en_name,
                     "address": row.address,
-                    "preCategory": preCategories,
+                    "preCategory": row.preCategory,
                 }
-                categories.append(category)
+                for row in category_result.all()
+            ]
 
-            return categories
+            return JSONBytesResponse(encode_json(categories))
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -363,6 +949,7 @@ async def get_category(session: AsyncSession = Depends(get_async_session)):
     description="Получает все пред категории из таблицы preCategory",
     status_code=200,
 )
+@cached(PRECATEGORY)
 async def get_preCategory(session: AsyncSession = Depends(get_async_session)):
     async with session:
         try: 
@@ -391,6 +978,7 @@ async def get_preCategory(session: AsyncSession = Depends(get_async_session)):
     description="Получает все цвета из таблицы Colors",
     status_code=200,
 )
+@cached(COLORS)
 async def get_colors(session: AsyncSession = Depends(get_async_session)):
     async with session:
         try:
@@ -416,6 +1004,7 @@ async def get_colors(session: AsyncSession = Depends(get_async_session)):
     description="Получает все формы из таблицы Forms",
     status_code=200,
 )
+@cached(FORMS)
 async def get_forms(session: AsyncSession = Depends(get_async_session)):
     async with session:
         try:
@@ -428,7 +1017,8 @@ async def get_forms(session: AsyncSession = Depends(get_async_session)):
                     "ru_name": row[1],
                     "en_name": row[2],
                     "changeForm": row[3],
-                    "image": await get_static_img_url(row[4]),
+                    "image": static_urls.url(row[4]),
+                    "srcset": static_urls.srcset(row[4]),
                 }
                 forms.append(form)
 
@@ -454,96 +1044,87 @@ async def create_products(
 ):
     async with session.begin():
         try:
-            insert_data = []
-            for product in products:
-                product_id = random_id(100)
-                ru_name = product.ru_name
-                en_name = product.en_name
-                images = product.images
-                isFrom = product.isFrom
-                preCategory = product.preCategory
-                price_ru = product.price.ru_name
-                price_en = product.price.en_name
-                options = product.options
-                options_isForm = options.isForm
-                options_isColor = options.isColor
-                options_form_ids = options.form_ids
-                options_color_ids = options.color_ids
-
-                # Сохранение изображений
-                imgs_paths_url = []
-                for i, img_data in enumerate(images):
-                    img_path = (
-                        rf"{settings.STATIC_FOLDER}/img/{product_id}_{i}_product.png"
-                    )
-                    img_path_url = rf"static/img/{product_id}_{i}_product.png"
-                    await save_img(img_data, img_path)
-                    imgs_paths_url.append(img_path_url)
-
-                # Сохранение предкатегорий
-                pre_category_ids = []
-                for category in preCategory:
-                    # Проверяем, существует ли предкатегория
-                    existing_category = await session.execute(
-                        select(PreCategoryProducts).where(
-                            PreCategoryProducts.ru_name == category.ru_name,
-                            PreCategoryProducts.en_name == category.en_name,
-                            PreCategoryProducts.address == category.address,
-                        )
-                    )
-                    existing_category = existing_category.scalars().first()
-
-                    if existing_category:
-                        pre_category_ids.append(existing_category.id)
-                    else:
-                        # Создаем новую предкатегорию
-                        new_category = PreCategoryProducts(
-                            address=category.address,
-                            ru_name=category.ru_name,
-                            en_name=category.en_name,
-                        )
-                        session.add(new_category)
-                        await session.flush()  # Сохраняем, чтобы получить ID
-                        pre_category_ids.append(new_category.id)
-
-                # Формирование данных для вставки
-                insert_data.append(
-                    {
-                        "id": product_id,
-                        "ru_name_name": ru_name.name,
-                        "ru_name_desc": ru_name.desc,
-                        "en_name_name": en_name.name,
-                        "en_name_desc": en_name.desc,
-                        "images": imgs_paths_url,
-                        "isFrom": isFrom,
-                        "price_ru": price_ru,
-                        "price_en": price_en,
-                        "options_isForm": options_isForm,
-                        "options_isColor": options_isColor,
-                        "options_formId": options_form_ids,
-                        "options_colorId": options_color_ids,
-                    }
-                )
-
-            # Вставка данных в таблицу Products
-            stmt = insert(Products).values(insert_data)
-            await session.execute(stmt)
-
-            # Связываем продукты с предкатегориями
-            for product_id in [data["id"] for data in insert_data]:
-                for category_id in pre_category_ids:
-                    stmt = insert(product_precategory_association).values(
-                        product_id=product_id, precategory_id=category_id
-                    )
-                    await session.execute(stmt)
-
+            await import_products(session, products)
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(PRODUCTS)
             return {"message": "Products created successfully"}
         except Exception as e:
             await session.rollback()  # Откат транзакции в случае ошибки
             raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/products/import",
+    summary="Импорт продуктов",
+    description=(
+        "Импортирует товары из тела запроса в формате NDJSON (application/x-ndjson): "
+        "по одному объекту ProductSchema на строку. Тело читается потоком и "
+        "записывается пакетами в одной транзакции."
+    ),
+    status_code=201,
+)
+async def import_products_ndjson(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+):
+    async with session.begin():
+        imported = 0
+        batch: List[ProductSchema] = []
+        line_number = 0
+
+        def parse(line: bytes):
+            try:
+                batch.append(ProductSchema.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422, detail=f"line {line_number}: {e.errors()}"
+                )
+
+        def line_too_long():
+            return HTTPException(
+                status_code=413,
+                detail=f"line {line_number + 1}: longer than {settings.IMPORT_MAX_LINE_BYTES} bytes",
+            )
+
+        try:
+            # Перевод строки ищется только в новых байтах: длинная строка,
+            # пришедшая многими кусками, не сканируется и не копируется заново
+            buffer = bytearray()
+            async for chunk in request.stream():
+                scanned = len(buffer)
+                buffer += chunk
+                start = 0
+                while (end := buffer.find(b"\n", scanned)) != -1:
+                    if end - start > settings.IMPORT_MAX_LINE_BYTES:
+                        raise line_too_long()
+                    line = bytes(buffer[start:end])
+                    line_number += 1
+                    if line.strip():
+                        parse(line)
+                    if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                        imported += await import_products(session, batch)
+                        batch = []
+                    start = scanned = end + 1
+                del buffer[:start]
+                if len(buffer) > settings.IMPORT_MAX_LINE_BYTES:
+                    raise line_too_long()
+            if buffer.strip():
+                line_number += 1
+                parse(bytes(buffer))
+            imported += await import_products(session, batch)
+        except HTTPException:
+            await session.rollback()
+            raise
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+    await catalog_snapshot.invalidate()
+    await invalidate(PRODUCTS)
+    return {"message": "Products imported successfully", "imported": imported}
+
+
 @router.post(
     "/reviews",
     summary="Создание отзывов",
@@ -569,7 +1150,10 @@ async def create_review(
                 ProductId=productId,
             )
             await session.execute(stmt)
+            await apply_rating_changes(session, [(productId, rate, 1)])
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(REVIEWS, PRODUCTS)
             return {"message": "Review created successfully"}
 
         except Exception as e:
@@ -600,6 +1184,8 @@ async def create_colors(
             stmt = insert(Colors)
             await session.execute(stmt.values(color_data))
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(COLORS, PRODUCTS)
             return {"message": "Review created successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -617,24 +1203,23 @@ async def create_forms(
 ):
     async with session:
         try:
-            form_data = []
-            for form in forms:
-                form_id = random_id(103)
-                img_path = rf"{settings.STATIC_FOLDER}/img/{form_id}_form.png"
-                img_path_url = rf"static/img/{form_id}_form.png"
-                await save_img(form.image, img_path)
-                form_data.append(
-                    {
-                        "id": form_id,
-                        "en_name": form.name.en_name,
-                        "ru_name": form.name.ru_name,
-                        "changeForm": form.changeForm,
-                        "image": img_path_url,
-                    }
-                )
+            stored_paths = await store_images(session, [form.image for form in forms])
+            form_data = [
+                {
+                    "id": random_id(103),
+                    "en_name": form.name.en_name,
+                    "ru_name": form.name.ru_name,
+                    "changeForm": form.changeForm,
+                    "image": img_path_url,
+                }
+                for form, img_path_url in zip(forms, stored_paths)
+            ]
+
             stmt = insert(Forms)
             result = await session.execute(stmt.values(form_data))
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(FORMS, PRODUCTS)
             return {"message": "Review created successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -664,7 +1249,11 @@ async def create_categories(
             ]
             stmt = insert(Category)
             await session.execute(stmt.values(category_data))
+            await link_precategories(
+                session, {data["id"]: data["preCategory"] for data in category_data}
+            )
             await session.commit()
+            await invalidate(CATEGORY)
             return {"message": "Categories created successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -694,6 +1283,7 @@ async def create_preCategories(
             stmt = insert(PreCategory).values(insert_data)
             await session.execute(stmt)
             await session.commit()
+            await invalidate(PRECATEGORY, CATEGORY)
             return {"message": "Pre-categories created successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -731,6 +1321,7 @@ async def create_metatags(
             stmt = insert(Metatags)
             await session.execute(stmt.values(metatag_data))
             await session.commit()
+            await metatag_resolver.load(session)
             return {"message": "Metatags created successfully"}
         except IntegrityError:
             await session.rollback()
@@ -746,34 +1337,42 @@ async def create_metatags(
     status_code=201,
     response_model=MetatagsResponse,
 )
-async def get_metatags(
-    metatags: MetatagsSchemaPath = Body(...),
-    session: AsyncSession = Depends(get_async_session),
-):
-    async with session:
-        try:
-            if metatags.address is True:
-                stmt = select(
-                    Metatags.address,
-                    Metatags.title,
-                    Metatags.description,
-                    Metatags.keywords,
-                )
-                result = await session.execute(stmt)
-                metatags = result.all()
-                return {"metatags": metatags}
-            
-            if metatags.address is False:
-                return {"metatags": []}    
-            
-            else:
-                stmt = select(Metatags.address, Metatags.title, Metatags.description, Metatags.keywords).where(Metatags.address == metatags.address)
-                result = await session.execute(stmt)
-                metatags = result.all()
-                return {"metatags": metatags}
-            
-        except SQLAlchemyError as e:
-            raise HTTPException(status_code=500, detail=str(e))
+async def get_metatags(metatags: MetatagsSchemaPath = Body(...)):
+    if metatags.address is False:
+        return {"metatags": []}
+    return JSONBytesResponse(
+        encode_json(resolve_metatags(metatags.address)), status_code=201
+    )
+
+
+def resolve_metatags(address) -> Dict[str, Any]:
+    # Ответ только из памяти процесса, без запроса в базу
+    if address is True:
+        return {"metatags": metatag_resolver.all()}
+    found = metatag_resolver.resolve(address)
+    return {"metatags": [found] if found is not None else []}
+
+
+@router.get(
+    "/metatags",
+    summary="Метатеги страницы",
+    description=(
+        "Возвращает метатеги для адреса страницы `address` с учетом шаблонов вида "
+        "`/catalog/*` (побеждает самый длинный подходящий шаблон); без `address` — все "
+        "метатеги. Ответ отдается из памяти процесса, с ETag и Cache-Control для CDN."
+    ),
+    status_code=200,
+    response_model=MetatagsResponse,
+)
+async def get_metatags_by_address(request: Request, address: Optional[str] = None):
+    body, etag = encode_with_etag(resolve_metatags(True if address is None else address))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.METATAGS_MAX_AGE}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONBytesResponse(body, headers=headers)
 
 #
 # =====delete запросы=====
@@ -790,9 +1389,24 @@ async def delete_products(
 ):
     async with session:
         try:
+            images = await session.execute(
+                select(Products.images).where(Products.id.in_(product_ids))
+            )
+            orphans = await release(
+                session, [path for row in images.scalars() for path in row or []]
+            )
+            # Связи с формами и цветами удаляются каскадом, с предкатегориями — явно
+            await session.execute(
+                delete(product_precategory_association).where(
+                    product_precategory_association.c.product_id.in_(product_ids)
+                )
+            )
             stmt = delete(Products).where(Products.id.in_(product_ids))
             await session.execute(stmt)
             await session.commit()
+            await remove_orphans(session, orphans)
+            await catalog_snapshot.invalidate()
+            await invalidate(PRODUCTS)
             return {"message": "Products deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -809,9 +1423,18 @@ async def delete_reviews(
 ):
     async with session:
         try:
-            stmt = delete(Reviews).where(Reviews.id.in_(review_ids))
-            await session.execute(stmt)
+            stmt = (
+                delete(Reviews)
+                .where(Reviews.id.in_(review_ids))
+                .returning(Reviews.ProductId, Reviews.Rate)
+            )
+            deleted = await session.execute(stmt)
+            await apply_rating_changes(
+                session, [(row.ProductId, row.Rate, -1) for row in deleted]
+            )
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(REVIEWS, PRODUCTS)
             return {"message": "Reviews deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -831,6 +1454,8 @@ async def delete_colors(
             stmt = delete(Colors).where(Colors.id.in_(color_ids))
             await session.execute(stmt)
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(COLORS, PRODUCTS)
             return {"message": "Colors deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -847,9 +1472,16 @@ async def delete_forms(
 ):
     async with session:
         try:
+            images = await session.execute(
+                select(Forms.image).where(Forms.id.in_(form_ids))
+            )
+            orphans = await release(session, [path for path in images.scalars() if path])
             stmt = delete(Forms).where(Forms.id.in_(form_ids))
             await session.execute(stmt)
             await session.commit()
+            await remove_orphans(session, orphans)
+            await catalog_snapshot.invalidate()
+            await invalidate(FORMS, PRODUCTS)
             return {"message": "Forms deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -869,6 +1501,7 @@ async def delete_categories(
             stmt = delete(Category).where(Category.id.in_(category_ids))
             await session.execute(stmt)
             await session.commit()
+            await invalidate(CATEGORY)
             return {"message": "Categories deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -888,6 +1521,7 @@ async def delete_precategories(
             stmt = delete(PreCategory).where(PreCategory.id.in_(precategory_ids))
             await session.execute(stmt)
             await session.commit()
+            await invalidate(PRECATEGORY, CATEGORY)
             return {"message": "preCategories deleted successfully"}
         except SQLAlchemyError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -913,6 +1547,7 @@ async def delete_metatags(
             stmt = delete(Metatags).where(Metatags.address == metatag.address)
             await session.execute(stmt)
             await session.commit()
+            await metatag_resolver.load(session)
             return {"message": "Metatags deleted successfully"}
         except SQLAlchemyError as e:
             await session.rollback() 
@@ -965,29 +1600,43 @@ async def update_products(
             existing_product.options_isColor = product.options.isColor
             existing_product.options_formId = product.options.form_ids
             existing_product.options_colorId = product.options.color_ids
+            await session.execute(
+                delete(product_form_association).where(
+                    product_form_association.c.product_id == product_id
+                )
+            )
+            await session.execute(
+                delete(product_color_association).where(
+                    product_color_association.c.product_id == product_id
+                )
+            )
+            await link_options(
+                session, {product_id: (product.options.form_ids, product.options.color_ids)}
+            )
 
             images = product.images
 
             # Обновление или добавление новых изображений
+            orphans = []
             if images:
-                existing_product.images.clear()  # Очистка существующих изображений
-                for i, img in enumerate(images):
-                    img_path = (
-                        rf"{settings.STATIC_FOLDER}/img/{product_id}_{i}_product.png"
-                    )
-                    img_path_url = rf"static/img/{product_id}_{i}_product.png"
-                    await save_img(await img.read(), img_path)  # Сохраняем изображение
-                    existing_product.images.append(
-                        img_path_url
-                    )  # Добавляем путь к изображению
+                new_paths = await store_images(session, images)
+                orphans = await release(session, existing_product.images or [])
+                # JSON-колонка не отслеживает изменения списка на месте,
+                # поэтому присваиваем новый список
+                existing_product.images = new_paths
 
             await session.commit()  # Коммит изменений
-            return {"message": "Product updated successfully"}
 
         except Exception as e:
             await session.rollback()  # Откат изменений в случае ошибки
             raise HTTPException(status_code=500, detail=str(e))
 
+    # Файлы удаляются в отдельной транзакции, когда блок begin() уже закрыт
+    await remove_orphans(session, orphans)
+    await catalog_snapshot.invalidate()
+    await invalidate(PRODUCTS)
+    return {"message": "Product updated successfully"}
+
 @router.patch(
     "/reviews/{review_id}",
     summary="Обновление отзывов",
@@ -1007,9 +1656,28 @@ async def update_reviews(
                 "Rate": review.Rate,
                 "ProductId": review.ProductId,
             }
+            # Старая оценка читается с блокировкой строки, чтобы счетчики
+            # не разошлись при параллельном изменении того же отзыва
+            previous = (
+                await session.execute(
+                    select(Reviews.ProductId, Reviews.Rate)
+                    .where(Reviews.id == review_id)
+                    .with_for_update()
+                )
+            ).first()
             stmt = update(Reviews).where(Reviews.id == review_id).values(update_data)
             await session.execute(stmt)
+            if previous is not None:
+                await apply_rating_changes(
+                    session,
+                    [
+                        (previous.ProductId, previous.Rate, -1),
+                        (review.ProductId, review.Rate, 1),
+                    ],
+                )
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(REVIEWS, PRODUCTS)
             return {"message": "Review updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -1035,6 +1703,8 @@ async def update_colors(
             stmt = update(Colors).where(Colors.id == color_id).values(update_data)
             await session.execute(stmt)
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(COLORS, PRODUCTS)
             return {"message": "Color updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -1061,6 +1731,8 @@ async def update_forms(
             stmt = update(Forms).where(Forms.id == form_id).values(update_data)
             await session.execute(stmt)
             await session.commit()
+            await catalog_snapshot.invalidate()
+            await invalidate(FORMS, PRODUCTS)
             return {"message": "Form updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -1086,7 +1758,14 @@ async def update_categories(
             }
             stmt = update(Category).where(Category.id == category_id).values(update_data)
             await session.execute(stmt)
+            await session.execute(
+                delete(category_precategory_association).where(
+                    category_precategory_association.c.category_id == category_id
+                )
+            )
+            await link_precategories(session, {category_id: category.preCategory})
             await session.commit()
+            await invalidate(CATEGORY)
             return {"message": "Category updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -1115,6 +1794,7 @@ async def update_precategories(
             )
             await session.execute(stmt)
             await session.commit()
+            await invalidate(PRECATEGORY, CATEGORY)
             return {"message": "Pre-category updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -1142,6 +1822,7 @@ async def update_metatags(
             stmt = update(Metatags).where(Metatags.address == metatag_address).values(update_data)
             await session.execute(stmt)
             await session.commit()
+            await metatag_resolver.load(session)
             return {"message": "Metatag updated successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
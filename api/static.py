@@ -0,0 +1,194 @@
+import os
+import re
+from mimetypes import guess_type
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from config.config import settings
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# main.bc005ab4.js, main.615ca833.css, 453.b3b29214.chunk.js
+BUNDLE_FINGERPRINT = re.compile(r"\.[0-9a-f]{8,}\.")
+# static/img/<sha256>.png и его производные <sha256>_480.webp
+BLOB_FINGERPRINT = re.compile(r"^[0-9a-f]{64}(_\d+)?\.")
+
+# Предсжатые копии рядом с файлом: порядок — приоритет
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = (".js", ".css", ".map", ".json", ".svg", ".html", ".txt")
+
+BYTES_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def static_to_disk(path: str) -> str:
+    # "static/img/x.png" -> "{STATIC_FOLDER}/img/x.png"
+    return rf"{settings.STATIC_FOLDER}/{path.split('/', 1)[1]}"
+
+
+def is_fingerprinted(path: str) -> bool:
+    name = os.path.basename(path)
+    return bool(BUNDLE_FINGERPRINT.search(name) or BLOB_FINGERPRINT.match(name))
+
+
+def accepted_encodings(headers: Headers) -> set:
+    encodings = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает один диапазон `bytes=start-end`. Возвращает (start, end)
+    включительно или None, если заголовок не поддерживается или записан
+    неверно (несколько диапазонов, start > end и т.п.) — тогда отдается
+    весь файл (RFC 7233, 2.1). Для невыполнимого диапазона, начинающегося
+    за концом файла, возвращает (size, size).
+    """
+    match = BYTES_RANGE.match(value.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            return size, size
+        return max(0, size - length), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return size, size
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+class FileRangeResponse(Response):
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, start: int, end: int, headers: dict, media_type: str):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = 206
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.end - self.start + 1
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles с долгим кэшированием файлов с отпечатком в имени,
+    строгими ETag, ответами 304, поддержкой Range и отдачей
+    предсжатых `.br`/`.gz` копий JS/CSS.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = guess_type(full_path)[0] or "text/plain"
+        range_header = request_headers.get("range")
+
+        headers = {
+            "cache-control": IMMUTABLE if is_fingerprinted(full_path) else REVALIDATE,
+            "accept-ranges": "bytes",
+        }
+
+        serve_path, serve_stat, encoding = full_path, stat_result, None
+        if full_path.endswith(COMPRESSIBLE):
+            headers["vary"] = "Accept-Encoding"
+            # Диапазоны отдаются только из несжатого файла
+            accepted = set() if range_header else accepted_encodings(request_headers)
+            for name, suffix in PRECOMPRESSED:
+                if name not in accepted:
+                    continue
+                try:
+                    sibling_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                # Устаревшая копия (старше исходника) не используется
+                if sibling_stat.st_mtime >= stat_result.st_mtime:
+                    serve_path, serve_stat, encoding = full_path + suffix, sibling_stat, name
+                    break
+
+        etag = f'"{serve_stat.st_mtime_ns:x}-{serve_stat.st_size:x}'
+        etag += f'-{encoding}"' if encoding else '"'
+        headers["etag"] = etag
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        response = FileResponse(
+            serve_path,
+            status_code=status_code,
+            stat_result=serve_stat,
+            headers=headers,
+            media_type=media_type,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        if range_header and status_code == 200:
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range == etag:
+                byte_range = parse_range(range_header, serve_stat.st_size)
+                if byte_range is not None:
+                    start, end = byte_range
+                    size = serve_stat.st_size
+                    if start >= size:
+                        return Response(
+                            status_code=416,
+                            headers={"content-range": f"bytes */{size}", **headers},
+                        )
+                    headers["content-range"] = f"bytes {start}-{end}/{size}"
+                    headers["content-length"] = str(end - start + 1)
+                    headers["last-modified"] = response.headers["last-modified"]
+                    return FileRangeResponse(serve_path, start, end, headers, media_type)
+
+        return response
@@ -0,0 +1,59 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from config.config import settings
+
+from .derivatives import existing_variant_paths
+from .static import is_fingerprinted, static_to_disk
+
+# Сколько разных путей изображений держится в кэше URL
+URL_CACHE_SIZE = 65536
+
+
+class StaticURLBuilder:
+    """
+    Строит URL статических файлов. С ASSET_HOST файлы отдаются с CDN,
+    без него — с APP_URL. Файлы с хэшем содержимого в имени (static/img/
+    <sha256>.png) неизменяемы и отдаются как есть; к остальным добавляется
+    ?v=ASSET_VERSION, чтобы смена версии сбрасывала кэш CDN и браузеров.
+
+    URL и srcset каждого пути вычисляются один раз и дальше берутся из
+    кэша: сборка каталога не форматирует строки заново для каждого товара,
+    а srcset не проверяет заново, какие копии изображения есть на диске.
+    """
+
+    def __init__(self, host: str, version: str = ""):
+        self.host = host.rstrip("/")
+        self.version = version
+        self.url = lru_cache(maxsize=URL_CACHE_SIZE)(self._url)
+        self.srcset = lru_cache(maxsize=URL_CACHE_SIZE)(self._srcset)
+
+    def _url(self, path: str) -> str:
+        url = f"{self.host}/{path}"
+        if self.version and not is_fingerprinted(path):
+            url += f"?v={self.version}"
+        return url
+
+    def _srcset(self, path: str) -> Dict[str, str]:
+        # {"webp": "url 160w, url 480w, ...", "jpeg": "..."} для атрибута srcset
+        return {
+            fmt: ", ".join(f"{self.url(variant)} {width}w" for width, variant in sizes.items())
+            for fmt, sizes in existing_variant_paths(path, static_to_disk(path)).items()
+        }
+
+    def images(self, paths: Optional[List[str]]) -> Tuple[List[str], List[Dict[str, str]]]:
+        # URL и srcset всех изображений товара за один вызов
+        paths = paths or []
+        return [self.url(path) for path in paths], [self.srcset(path) for path in paths]
+
+    def stats(self) -> Dict[str, int]:
+        url, srcset = self.url.cache_info(), self.srcset.cache_info()
+        return {
+            "url_hits": url.hits,
+            "url_misses": url.misses,
+            "srcset_hits": srcset.hits,
+            "srcset_misses": srcset.misses,
+        }
+
+
+static_urls = StaticURLBuilder(settings.ASSET_HOST or settings.APP_URL, settings.ASSET_VERSION)
@@ -1,9 +1,12 @@
 from config.config import settings
 import base64
-import cv2
-import numpy as np
+import asyncio
 import uuid
 
+from .images import image_executor
+from .derivatives import write_variants
+
+
 def correct_padding(data):
     missing_padding = len(data) % 4
     if missing_padding:
@@ -11,17 +14,31 @@ def correct_padding(data):
     return data
 
 
-async def save_img(encoded_data, filename):
+def decode_and_write_img(encoded_data, filename):
+    # OpenCV и NumPy загружаются при первой записи изображения в пуле потоков,
+    # а не при старте каждого воркера
+    import cv2
+    import numpy as np
+
     encoded_data = correct_padding(encoded_data)
     nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    return cv2.imwrite(filename, img)
+    written = cv2.imwrite(filename, img)
+    write_variants(img, filename)
+    return written
+
+
+async def save_img(encoded_data, filename):
+    return await image_executor.run(decode_and_write_img, encoded_data, filename)
+
+
+async def save_imgs(items):
+    # items — пары (base64-данные, путь); картинки одного запроса пишутся параллельно
+    return await asyncio.gather(
+        *(save_img(encoded_data, filename) for encoded_data, filename in items)
+    )
 
 
 # Генератор рандомного id
 def random_id(num: int):
     return int(f"{num}{uuid.uuid4().int >> (128 - 32)}")
-
-
-async def get_static_img_url(filename: str) -> str:
-    return f"{settings.APP_URL}/{filename}"
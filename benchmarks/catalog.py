@@ -0,0 +1,233 @@
+"""
+Нагрузочные сценарии API каталога: для каждого размера каталога база
+наполняется benchmarks.seed, после чего приложение опрашивается
+в процессе через httpx.AsyncClient (ASGITransport, без сети). Кэш ответов
+выключен, чтобы замерялись обработчики, а не Redis. Для каждого сценария
+считаются p50/p95/p99, запросы в секунду и пик выделенной памяти Python
+на запрос (tracemalloc, отдельным проходом). Отчет в JSON с постоянным
+порядком ключей удобно сравнивать между коммитами.
+
+    python -m benchmarks.catalog [--sizes 1000,10000,100000] [--requests 200]
+        [--concurrency 8] [--scenarios products_page,product] [--output report.json]
+    python -m benchmarks.catalog --compare before.json after.json
+"""
+import sys
+import json
+import time
+import asyncio
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from config.config import settings
+
+from .seed import (
+    PRODUCT_ID,
+    COLOR_ID,
+    FORM_ID,
+    is_local_database,
+    seed,
+)
+
+ALLOCATION_RUNS = 5
+
+
+def scenarios() -> Dict[str, str]:
+    # Запросы фронтенда и админки; id — из детерминированного наполнения
+    return {
+        "products_full": "/api/products",
+        "products_page": "/api/products?limit=50",
+        "products_page_fields": "/api/products?limit=50&fields=name,price,images",
+        "products_precategory": "/api/products?limit=50&preCategory=/catalog/7",
+        "products_price": "/api/products?limit=50&price_min=20000&price_max=40000",
+        "products_form": f"/api/products?limit=50&form_id={FORM_ID + 1}",
+        "products_color": f"/api/products?limit=50&color_id={COLOR_ID + 1}",
+        "product": f"/api/products/{PRODUCT_ID + 1}",
+        "product_reviews": f"/api/products/{PRODUCT_ID + 1}/reviews?limit=20",
+        "search": "/api/products/search?q=chair&lang=en&limit=20",
+        "category": "/api/category",
+        "colors": "/api/colors",
+        "forms": "/api/forms",
+    }
+
+
+def argument(name: str, default: str) -> str:
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def measure_latency(
+    client: httpx.AsyncClient, path: str, total: int, concurrency: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def measure_allocations(client: httpx.AsyncClient, path: str) -> Dict[str, Any]:
+    # Отдельный последовательный проход: tracemalloc сильно замедляет запросы
+    peaks = []
+    response_bytes = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ALLOCATION_RUNS):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            response = await client.get(path)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+            response_bytes = len(response.content)
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_bytes": int(statistics.median(peaks)),
+        "response_bytes": response_bytes,
+    }
+
+
+async def run_size(
+    app, size: int, names: List[str], total: int, concurrency: int
+) -> Dict[str, Any]:
+    from api.catalog import catalog_snapshot
+
+    await seed(size)
+    # База наполнена в обход API, снимок каталога прошлого размера устарел
+    await catalog_snapshot.invalidate()
+    paths = scenarios()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in names:
+            path = paths[name]
+            # Прогрев: снимок каталога, планы запросов, соединения пула
+            for _ in range(3):
+                await client.get(path)
+            result = await measure_latency(client, path, total, concurrency)
+            result.update(await measure_allocations(client, path))
+            results[name] = result
+            print(
+                f"{size:>7} {name:<22} p50 {result['p50_ms']:>9.2f} ms  "
+                f"p95 {result['p95_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                f"{result['rps']:>8.1f} rps  {result['alloc_peak_bytes'] / 1024:>9.1f} KiB"
+                + (f"  errors {result['errors']}" if result["errors"] else "")
+            )
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def main(sizes: List[int], names: List[str], total: int, concurrency: int, output: str):
+    import main as app_module
+    from api.cache import init_cache
+
+    settings.CACHE_ENABLED = False
+    await init_cache()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "requests": total,
+            "concurrency": concurrency,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        report["results"][str(size)] = await run_size(
+            app_module.app, size, names, total, concurrency
+        )
+
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, sort_keys=True, ensure_ascii=False)
+        file.write("\n")
+    print(f"Report written to {output}")
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, encoding="utf-8") as file:
+        after = json.load(file)
+
+    print(f"{before['meta']['commit'] or before_path} -> {after['meta']['commit'] or after_path}")
+    for size, results in after["results"].items():
+        for name, result in results.items():
+            old = before["results"].get(size, {}).get(name)
+            if old is None:
+                continue
+            changes: List[Tuple[str, float, float]] = [
+                (key, old[key], result[key])
+                for key in ("p50_ms", "p95_ms", "p99_ms", "rps", "alloc_peak_bytes")
+            ]
+            print(
+                f"{size:>7} {name:<22} "
+                + "  ".join(
+                    f"{key} {(new / value - 1) * 100 if value else 0:+6.1f}%"
+                    for key, value, new in changes
+                )
+            )
+
+
+if __name__ == "__main__":
+    if "--compare" in sys.argv:
+        index = sys.argv.index("--compare")
+        compare(sys.argv[index + 1], sys.argv[index + 2])
+        sys.exit()
+
+    if not is_local_database() and "--force" not in sys.argv:
+        sys.exit(f"{settings.DB_HOST} is not a local database, pass --force to benchmark it anyway")
+
+    sizes = [int(value) for value in argument("--sizes", "1000,10000,100000").split(",")]
+    names = argument("--scenarios", ",".join(scenarios())).split(",")
+    unknown = set(names) - set(scenarios())
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(
+        main(
+            sizes,
+            names,
+            int(argument("--requests", "200")),
+            int(argument("--concurrency", "8")),
+            argument("--output", "benchmark.json"),
+        )
+    )
@@ -0,0 +1,97 @@
+"""
+Сравнение построения URL изображений при сборке каталога:
+корутина на каждое изображение (прежний get_static_img_url/srcset)
+против StaticURLBuilder с кэшем.
+
+    python -m benchmarks.image_urls [число товаров] [повторы]
+"""
+import os
+import sys
+import shutil
+import asyncio
+import timeit
+import tempfile
+
+from config.config import settings
+
+from api.derivatives import variant_paths
+from api.static import static_to_disk
+from api.urls import StaticURLBuilder
+
+
+async def coroutine_url(filename: str) -> str:
+    return f"{settings.APP_URL}/{filename}"
+
+
+async def coroutine_srcset(filename: str) -> dict:
+    return {
+        fmt: ", ".join([f"{await coroutine_url(path)} {width}w" for width, path in sizes.items()])
+        for fmt, sizes in variant_paths(filename).items()
+    }
+
+
+def make_images(count: int):
+    # Как в рабочем каталоге: у товаров 1–3 изображения, часть общая
+    return [[f"static/img/{(i * 3 + n) % 2000:064x}.png" for n in range(1 + i % 3)] for i in range(count)]
+
+
+async def build_coroutines(products):
+    return [
+        ([await coroutine_url(img) for img in images], [await coroutine_srcset(img) for img in images])
+        for images in products
+    ]
+
+
+def build_builder(builder: StaticURLBuilder, products):
+    return [builder.images(images) for images in products]
+
+
+def create_variants(products):
+    # srcset перечисляет только копии, которые есть на диске: создаем пустые
+    for path in {path for images in products for path in images}:
+        for sizes in variant_paths(static_to_disk(path)).values():
+            for variant in sizes.values():
+                open(variant, "wb").close()
+
+
+def main(count: int, repeat: int):
+    products = make_images(count)
+    settings.STATIC_FOLDER = tempfile.mkdtemp()
+    os.makedirs(f"{settings.STATIC_FOLDER}/img")
+    create_variants(products)
+    builder = StaticURLBuilder(settings.APP_URL)
+    loop = asyncio.new_event_loop()
+    assert loop.run_until_complete(build_coroutines(products)) == [
+        tuple(map(list, pair)) for pair in build_builder(builder, products)
+    ]
+
+    results = {
+        "coroutine per image": min(
+            timeit.repeat(
+                lambda: loop.run_until_complete(build_coroutines(products)), number=1, repeat=repeat
+            )
+        ),
+        # Первая сборка после старта: кэш URL пуст
+        "builder, cold cache": min(
+            timeit.repeat(
+                lambda: build_builder(StaticURLBuilder(settings.APP_URL), products), number=1, repeat=repeat
+            )
+        ),
+        "builder, warm cache": min(
+            timeit.repeat(lambda: build_builder(builder, products), number=1, repeat=repeat)
+        ),
+    }
+    loop.close()
+    shutil.rmtree(settings.STATIC_FOLDER)
+
+    base = results["coroutine per image"]
+    images = sum(len(images) for images in products)
+    print(f"{count} products, {images} images")
+    for name, seconds in results.items():
+        print(f"{name:>22}: {seconds * 1000:8.2f} ms  x{base / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(count, repeat)
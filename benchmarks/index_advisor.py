@@ -0,0 +1,171 @@
+"""
+Поиск последовательных сканирований в запросах API: прогоняет запросы
+фронтенда и админки через приложение, перехватывает их SQL и печатает
+EXPLAIN (ANALYZE, BUFFERS) с seq scan по большим таблицам. С --seed N
+сначала пересоздает схему и наполняет ее через benchmarks.seed, поэтому
+запускать только на локальной/тестовой базе.
+
+    python -m benchmarks.index_advisor [--seed N] [--force]
+"""
+import sys
+import json
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+import httpx
+from sqlalchemy import event, select, text
+
+from config.config import settings
+from database.session import engine, async_session_maker
+from database.models import Products, Colors, Forms, PreCategoryProducts
+
+from api.cache import init_cache
+
+from .seed import is_local_database, seed
+
+# Seq scan меньше этого числа строк не считается проблемой:
+# последовательное чтение маленькой таблицы дешевле индекса
+SMALL_TABLE_ROWS = 1000
+
+
+async def scenarios() -> List[Tuple[str, str, Any]]:
+    # Запросы, которые отправляет фронтенд и админка
+    async with async_session_maker() as session:
+        product_id = (await session.execute(select(Products.id).limit(1))).scalar()
+        color_id = (await session.execute(select(Colors.id).limit(1))).scalar()
+        form_id = (await session.execute(select(Forms.id).limit(1))).scalar()
+        address = (await session.execute(select(PreCategoryProducts.address).limit(1))).scalar()
+
+    return [
+        ("GET", "/api/products", None),
+        ("GET", "/api/products?limit=50", None),
+        ("GET", f"/api/products?limit=50&preCategory={address}", None),
+        ("GET", "/api/products?limit=50&price_min=200&price_max=400", None),
+        ("GET", f"/api/products?limit=50&form_id={form_id}", None),
+        ("GET", f"/api/products?limit=50&color_id={color_id}", None),
+        ("GET", f"/api/products/{product_id}", None),
+        ("GET", f"/api/products/{product_id}/reviews?limit=20", None),
+        ("GET", "/api/products/search?q=Product 12&lang=en", None),
+        ("GET", "/api/products/export?format=ndjson", None),
+        ("GET", "/api/category", None),
+        ("GET", "/api/preCategory", None),
+        ("GET", "/api/colors", None),
+        ("GET", "/api/forms", None),
+        ("GET", "/api/reviews", None),
+    ]
+
+
+def find_seq_scans(plan: Dict[str, Any], found: List[Dict[str, Any]]):
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        find_seq_scans(child, found)
+
+
+async def explain(statements: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    EXPLAIN (ANALYZE, BUFFERS) для каждого запроса. Каждый запрос
+    выполняется в отдельной транзакции, которая затем откатывается.
+    """
+    reports = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            transaction = await conn.begin()
+            try:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+                )
+                plan = result.scalar()
+            finally:
+                await transaction.rollback()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]
+            scans = []
+            find_seq_scans(plan["Plan"], scans)
+            reports.append(
+                {
+                    "statement": statement,
+                    "execution_time": plan.get("Execution Time"),
+                    "seq_scans": scans,
+                }
+            )
+    return reports
+
+
+async def main(seed_count: int = 0):
+    import main as app_module
+
+    # Без кэша ответов каждый запрос доходит до базы
+    settings.CACHE_ENABLED = False
+    await init_cache()
+
+    if seed_count:
+        await seed(seed_count)
+        print(f"Seeded {seed_count} products")
+
+    captured: Dict[str, Any] = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany or statement.lstrip().upper().startswith("EXPLAIN"):
+            return
+        captured.setdefault(statement, parameters)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://advisor") as client:
+        # Без свежей статистики планировщик выбирает seq scan даже при наличии индекса
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE"))
+
+        requests = await scenarios()
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            for method, path, body in requests:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    print(f"{method} {path}: {response.status_code}")
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    statements = [
+        (statement, parameters)
+        for statement, parameters in captured.items()
+        if statement.lstrip().upper().startswith(("SELECT", "WITH"))
+    ]
+    reports = await explain(statements)
+
+    problems = 0
+    for report in reports:
+        # Полное чтение таблицы без условий (весь каталог, выгрузка) — не проблема;
+        # подозрительны большие seq scan в запросах с WHERE
+        filtered = " WHERE " in report["statement"].upper()
+        large = [
+            scan for scan in report["seq_scans"]
+            if scan.get("Rows Removed by Filter", 0) >= SMALL_TABLE_ROWS
+            or (
+                filtered
+                and scan.get("Actual Rows", 0) * scan.get("Actual Loops", 1) >= SMALL_TABLE_ROWS
+            )
+        ]
+        status = "SEQ SCAN" if large else "ok"
+        problems += bool(large)
+        statement = " ".join(report["statement"].split())
+        print(f"[{status}] {report['execution_time']:.2f} ms  {statement[:160]}")
+        for scan in report["seq_scans"]:
+            print(
+                f"    Seq Scan on {scan.get('Relation Name')}: rows={scan.get('Actual Rows')} "
+                f"loops={scan.get('Actual Loops')} removed={scan.get('Rows Removed by Filter', 0)} "
+                f"filter={scan.get('Filter', '-')}"
+            )
+
+    print(f"{len(reports)} queries, {problems} with sequential scans over {SMALL_TABLE_ROWS}+ rows")
+    return problems
+
+
+if __name__ == "__main__":
+    seed_count = 0
+    if "--seed" in sys.argv:
+        seed_count = int(sys.argv[sys.argv.index("--seed") + 1])
+    if seed_count and not is_local_database() and "--force" not in sys.argv:
+        sys.exit(f"{settings.DB_HOST} is not a local database, pass --force to seed it anyway")
+    asyncio.run(main(seed_count))
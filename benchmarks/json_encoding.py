@@ -0,0 +1,75 @@
+"""
+Сравнение сериализации ответа GET /api/products:
+jsonable_encoder + json (по умолчанию в FastAPI) против orjson.
+
+    python -m benchmarks.json_encoding [число товаров] [повторы]
+"""
+import sys
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from api.responses import encode_json
+
+
+def make_catalog(count: int) -> dict:
+    colors = [
+        {"id": 102000 + i, "ru_name": f"Цвет {i}", "en_name": f"Color {i}", "rgb": "#a0b0c0"}
+        for i in range(10)
+    ]
+    forms = [
+        {
+            "id": 103000 + i,
+            "ru_name": f"Форма {i}",
+            "en_name": f"Form {i}",
+            "changeForm": 1.5,
+            "image": f"https://example.com/static/img/{i}_form.png",
+        }
+        for i in range(5)
+    ]
+    products = [
+        {
+            "id": 100000 + i,
+            "ru_name": {"name": f"Товар {i}", "desc": "Описание товара " * 20},
+            "en_name": {"name": f"Product {i}", "desc": "Product description " * 20},
+            "images": [f"https://example.com/static/img/{i}_{n}_product.png" for n in range(3)],
+            "isFrom": i % 2 == 0,
+            "price": {"ru_name": 1000.0 + i, "en_name": 10.0 + i},
+            "options": {"isForm": True, "isColor": True, "form": forms[:3], "color": colors[:4]},
+            "preCategory": [{"id": 1, "address": "/catalog/a", "ru_name": "а", "en_name": "a"}],
+        }
+        for i in range(count)
+    ]
+    return {"Products": products}
+
+
+def stdlib_encode(payload: dict) -> bytes:
+    # Путь FastAPI по умолчанию: jsonable_encoder + JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def main(count: int, repeat: int):
+    payload = make_catalog(count)
+    assert json.loads(stdlib_encode(payload)) == json.loads(encode_json(payload))
+
+    results = {
+        "jsonable_encoder+json": min(timeit.repeat(lambda: stdlib_encode(payload), number=1, repeat=repeat)),
+        "orjson": min(timeit.repeat(lambda: encode_json(payload), number=1, repeat=repeat)),
+    }
+    base = results["jsonable_encoder+json"]
+    print(f"{count} products, {len(encode_json(payload))} bytes")
+    for name, seconds in results.items():
+        print(f"{name:>24}: {seconds * 1000:8.2f} ms  x{base / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(count, repeat)
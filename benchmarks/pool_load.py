@@ -0,0 +1,149 @@
+"""
+Нагрузочный профиль пула соединений: для каждой пары (воркеры uvicorn,
+DB_POOL_SIZE) поднимает сервер, отправляет запросы с заданной
+конкурентностью и печатает пропускную способность, задержки и ожидание
+соединения из /internal/pool. Запускать только на локальной/тестовой базе.
+
+    python -m benchmarks.pool_load [--workers 1,2,4] [--pool 5,10,20]
+        [--concurrency 64] [--requests 2000] [--path /api/products?limit=50]
+"""
+import os
+import sys
+import time
+import secrets
+import asyncio
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config.config import settings
+
+PORT = 8765
+
+# /internal/* закрыт токеном: сервер запускается с известным токеном
+TOKEN = (
+    settings.PROFILING_TOKEN.get_secret_value() if settings.PROFILING_TOKEN else secrets.token_hex(16)
+)
+
+
+def argument(name: str, default: str) -> str:
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/internal/pool", headers={"x-profile-token": TOKEN})).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("server did not start")
+
+
+async def load(client: httpx.AsyncClient, path: str, concurrency: int, total: int):
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def profile(workers: int, pool_size: int, concurrency: int, total: int, path: str):
+    env = dict(
+        os.environ,
+        DB_POOL_SIZE=str(pool_size),
+        # Без переполнения видно ровно то, что дает DB_POOL_SIZE
+        DB_MAX_OVERFLOW="0",
+        CACHE_ENABLED="false",
+        PROFILING_TOKEN=TOKEN,
+        # Локальная база наполнена benchmarks.seed, без ревизии Alembic
+        DB_STARTUP="create_all",
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--port", str(PORT), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=None
+        ) as client:
+            await wait_ready(client)
+            await load(client, path, concurrency, min(total, concurrency * 2))
+            latencies, errors, elapsed = await load(client, path, concurrency, total)
+            # С несколькими воркерами ответ приходит от одного из них
+            pool: Optional[Dict[str, Any]] = (
+                await client.get("/internal/pool", headers={"x-profile-token": TOKEN})
+            ).json()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "workers": workers,
+        "pool_size": pool_size,
+        "connections": workers * pool_size,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "errors": errors,
+        "pool_wait_avg": pool["wait_time_avg"],
+        "pool_wait_max": pool["wait_time_max"],
+        "pool_timeouts": pool["timeouts"],
+    }
+
+
+async def main():
+    workers_list = [int(value) for value in argument("--workers", "1,2,4").split(",")]
+    pool_sizes = [int(value) for value in argument("--pool", "5,10,20").split(",")]
+    concurrency = int(argument("--concurrency", "64"))
+    total = int(argument("--requests", "2000"))
+    path = argument("--path", "/api/products?limit=50")
+
+    print(f"{settings.DB_HOST}/{settings.DB_NAME}  {path}  concurrency={concurrency}")
+    print(
+        f"{'workers':>7} {'pool':>5} {'conns':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'errors':>6} {'wait avg ms':>11} {'wait max ms':>11} {'timeouts':>8}"
+    )
+    for workers in workers_list:
+        for pool_size in pool_sizes:
+            row = await profile(workers, pool_size, concurrency, total, path)
+            print(
+                f"{row['workers']:>7} {row['pool_size']:>5} {row['connections']:>6} "
+                f"{row['rps']:>8.1f} {row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} "
+                f"{row['errors']:>6} {row['pool_wait_avg'] * 1000:>11.2f} "
+                f"{row['pool_wait_max'] * 1000:>11.2f} {row['pool_timeouts']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
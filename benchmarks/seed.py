@@ -0,0 +1,250 @@
+"""
+Наполнение базы тестовым каталогом напрямую через модели
+database/models.py: цвета, формы, предкатегории, категории, товары со
+связями, отзывы и статистика оценок. Данные детерминированы — при одном
+и том же N получается одна и та же база. Схема пересоздается, поэтому
+запускать только на локальной/тестовой базе.
+
+    python -m benchmarks.seed [число товаров] [--force]
+"""
+import sys
+import time
+import random
+import asyncio
+from typing import Any, Dict, List
+
+from sqlalchemy import case, func, insert, select, text
+
+from config.config import settings
+from database import session as db
+from database.models import (
+    Products,
+    Reviews,
+    ProductRatingStats,
+    Colors,
+    Forms,
+    Category,
+    PreCategory,
+    PreCategoryProducts,
+    Metatags,
+    product_precategory_association,
+    product_form_association,
+    product_color_association,
+    category_precategory_association,
+)
+
+BATCH_SIZE = 5000
+
+COLORS = 20
+FORMS = 10
+PRECATEGORIES = 40
+CATEGORIES = 8
+REVIEWS_PER_PRODUCT = 2
+METATAGS = 50
+
+# Постоянные id вместо random_id: отчеты разных прогонов сравнимы
+PRODUCT_ID = 100_000_000_000
+COLOR_ID = 102_000_000_000
+FORM_ID = 103_000_000_000
+PRECATEGORY_ID = 104_000_000_000
+CATEGORY_ID = 105_000_000_000
+MENU_ID = 106_000_000_000
+REVIEW_ID = 107_000_000_000
+METATAG_ID = 108_000_000_000
+
+WORDS_RU = ("кресло", "стул", "диван", "стол", "полка", "шкаф", "тумба", "комод", "кровать", "пуф")
+WORDS_EN = ("armchair", "chair", "sofa", "table", "shelf", "wardrobe", "cabinet", "dresser", "bed", "pouf")
+
+
+def is_local_database() -> bool:
+    return settings.DB_HOST in ("localhost", "127.0.0.1", "::1") or settings.DB_HOST.startswith("/")
+
+
+def batches(rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start : start + BATCH_SIZE]
+
+
+async def insert_rows(session, table, rows: List[Dict[str, Any]]):
+    for batch in batches(rows):
+        await session.execute(insert(table), batch)
+
+
+def product_rows(count: int, rng: random.Random):
+    products, forms, colors, precategories = [], [], [], []
+    for n in range(count):
+        product_id = PRODUCT_ID + n
+        word = n % len(WORDS_RU)
+        form_ids = rng.sample(range(FORMS), rng.randint(0, 3))
+        color_ids = rng.sample(range(COLORS), rng.randint(0, 4))
+        products.append(
+            {
+                "id": product_id,
+                "ru_name_name": f"{WORDS_RU[word].capitalize()} {n}",
+                "ru_name_desc": f"Описание: {WORDS_RU[word]} из массива, модель {n}",
+                "en_name_name": f"{WORDS_EN[word].capitalize()} {n}",
+                "en_name_desc": f"Description: solid wood {WORDS_EN[word]}, model {n}",
+                "images": [f"static/img/{n % 97:064x}.png" for _ in range(rng.randint(1, 3))],
+                "isFrom": n % 3 == 0,
+                "price_ru": float(rng.randint(1000, 90000)),
+                "price_en": float(rng.randint(10, 900)),
+                "options_isForm": bool(form_ids),
+                "options_isColor": bool(color_ids),
+                "options_formId": [FORM_ID + i for i in form_ids],
+                "options_colorId": [COLOR_ID + i for i in color_ids],
+            }
+        )
+        forms += [
+            {"product_id": product_id, "form_id": FORM_ID + i, "position": position}
+            for position, i in enumerate(form_ids)
+        ]
+        colors += [
+            {"product_id": product_id, "color_id": COLOR_ID + i, "position": position}
+            for position, i in enumerate(color_ids)
+        ]
+        precategories.append(
+            {"product_id": product_id, "precategory_id": PRECATEGORY_ID + n % PRECATEGORIES}
+        )
+    return products, forms, colors, precategories
+
+
+async def seed(count: int, random_seed: int = 0):
+    """Пересоздает схему и наполняет ее каталогом из `count` товаров."""
+    rng = random.Random(random_seed)
+    await db.drop_db()
+    await db.create_db()
+
+    async with db.async_session_maker() as session:
+        await insert_rows(
+            session,
+            Colors,
+            [
+                {"id": COLOR_ID + i, "ru_name": f"Цвет {i}", "en_name": f"Color {i}", "rgb": f"{i * 12},80,120"}
+                for i in range(COLORS)
+            ],
+        )
+        await insert_rows(
+            session,
+            Forms,
+            [
+                {
+                    "id": FORM_ID + i,
+                    "ru_name": f"Форма {i}",
+                    "en_name": f"Form {i}",
+                    "changeForm": 1.0 + i / 10,
+                    "image": f"static/img/{i:064x}.png",
+                }
+                for i in range(FORMS)
+            ],
+        )
+        await insert_rows(
+            session,
+            PreCategoryProducts,
+            [
+                {
+                    "id": PRECATEGORY_ID + i,
+                    "address": f"/catalog/{i}",
+                    "ru_name": f"Раздел {i}",
+                    "en_name": f"Section {i}",
+                }
+                for i in range(PRECATEGORIES)
+            ],
+        )
+        await insert_rows(
+            session,
+            PreCategory,
+            [
+                {"id": MENU_ID + i, "address": f"/menu/{i}", "ru_name": f"Пункт {i}", "en_name": f"Item {i}"}
+                for i in range(PRECATEGORIES)
+            ],
+        )
+        await insert_rows(
+            session,
+            Category,
+            [
+                {
+                    "id": CATEGORY_ID + i,
+                    "address": f"/c/{i}",
+                    "ru_name": f"Категория {i}",
+                    "en_name": f"Category {i}",
+                    "preCategory": [MENU_ID + j for j in range(i, PRECATEGORIES, CATEGORIES)],
+                }
+                for i in range(CATEGORIES)
+            ],
+        )
+        await insert_rows(
+            session,
+            category_precategory_association,
+            [
+                {"category_id": CATEGORY_ID + i, "precategory_id": MENU_ID + j, "position": position}
+                for i in range(CATEGORIES)
+                for position, j in enumerate(range(i, PRECATEGORIES, CATEGORIES))
+            ],
+        )
+
+        products, forms, colors, precategories = product_rows(count, rng)
+        await insert_rows(session, Products, products)
+        await insert_rows(session, product_form_association, forms)
+        await insert_rows(session, product_color_association, colors)
+        await insert_rows(session, product_precategory_association, precategories)
+
+        await insert_rows(
+            session,
+            Reviews,
+            [
+                {
+                    "id": REVIEW_ID + n * REVIEWS_PER_PRODUCT + i,
+                    "Title": f"Отзыв {i}",
+                    "Description": "Хорошее качество, быстрая доставка",
+                    "Rate": rng.randint(1, 5),
+                    "ProductId": PRODUCT_ID + n,
+                }
+                for n in range(count)
+                for i in range(REVIEWS_PER_PRODUCT)
+            ],
+        )
+        # Статистика оценок одним запросом по всем отзывам, как ее ведет API
+        await session.execute(
+            insert(ProductRatingStats).from_select(
+                ["product_id", "count", "sum", "rate_1", "rate_2", "rate_3", "rate_4", "rate_5"],
+                select(
+                    Reviews.ProductId,
+                    func.count(),
+                    func.sum(Reviews.Rate),
+                    *(func.count(case((Reviews.Rate == rate, 1))) for rate in range(1, 6)),
+                ).group_by(Reviews.ProductId),
+            )
+        )
+
+        await insert_rows(
+            session,
+            Metatags,
+            [
+                {
+                    "id": METATAG_ID + i,
+                    "address": f"/page/{i}",
+                    "title": f"Page {i}",
+                    "description": "",
+                    "keywords": "",
+                }
+                for i in range(METATAGS)
+            ],
+        )
+        await session.commit()
+
+    # Свежая статистика планировщика, как в рабочей базе
+    async with db.engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+async def main(count: int):
+    started = time.perf_counter()
+    await seed(count)
+    print(f"Seeded {count} products in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    if not is_local_database() and "--force" not in sys.argv:
+        sys.exit(f"{settings.DB_HOST} is not a local database, pass --force to seed it anyway")
+    arguments = [value for value in sys.argv[1:] if not value.startswith("--")]
+    asyncio.run(main(int(arguments[0]) if arguments else 1000))
@@ -0,0 +1,100 @@
+"""
+Холодный старт воркера: время импорта приложения и память процесса
+после импорта (в отдельном интерпретаторе на каждый замер), а также
+загружен ли OpenCV. С --serve дополнительно поднимает uvicorn и меряет
+время до первого ответа и RSS воркера после старта (нужна база).
+
+    python -m benchmarks.startup [повторы] [--serve]
+"""
+import os
+import sys
+import json
+import time
+import secrets
+import statistics
+import subprocess
+
+import httpx
+
+from config.config import settings
+
+PORT = 8766
+
+# /internal/* закрыт токеном: сервер запускается с известным токеном
+TOKEN = (
+    settings.PROFILING_TOKEN.get_secret_value() if settings.PROFILING_TOKEN else secrets.token_hex(16)
+)
+
+# Выполняется в чистом интерпретаторе: печатает JSON с замерами
+IMPORT_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_seconds": elapsed,
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "cv2_loaded": "cv2" in sys.modules,
+    "numpy_loaded": "numpy" in sys.modules,
+}))
+"""
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_serve() -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        # Локальная база без ревизии Alembic: таблицы создаются при старте
+        env=dict(os.environ, PROFILING_TOKEN=TOKEN, DB_STARTUP="create_all"),
+    )
+    try:
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            try:
+                response = httpx.get(
+                    f"http://127.0.0.1:{PORT}/internal/pool", headers={"x-profile-token": TOKEN}
+                )
+                if response.status_code == 200:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.02)
+        else:
+            raise RuntimeError("server did not start")
+        return {"ready_seconds": time.perf_counter() - started, "rss_kib": rss_kib(server.pid)}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(repeat: int, serve: bool):
+    runs = [measure_import() for _ in range(repeat)]
+    print(f"import main: {len(runs)} runs")
+    print(f"  time     {statistics.median(r['import_seconds'] for r in runs) * 1000:8.1f} ms (median)")
+    print(f"  max RSS  {statistics.median(r['max_rss_kib'] for r in runs) / 1024:8.1f} MiB (median)")
+    print(f"  cv2 loaded: {runs[0]['cv2_loaded']}, numpy loaded: {runs[0]['numpy_loaded']}")
+
+    if serve:
+        results = [measure_serve() for _ in range(repeat)]
+        print(f"uvicorn main:app: {len(results)} runs")
+        print(f"  ready    {statistics.median(r['ready_seconds'] for r in results) * 1000:8.1f} ms (median)")
+        print(f"  RSS      {statistics.median(r['rss_kib'] for r in results) / 1024:8.1f} MiB (median)")
+
+
+if __name__ == "__main__":
+    arguments = [value for value in sys.argv[1:] if not value.startswith("--")]
+    main(int(arguments[0]) if arguments else 5, "--serve" in sys.argv)
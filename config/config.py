@@ -1,4 +1,5 @@
 import os
+from typing import List, Literal, Optional
 from dotenv import load_dotenv
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,6 +14,10 @@ class Settings(BaseSettings):
     )
 
     APP_URL: str = "http://localhost:8000"
+    # Адрес CDN для изображений (https://cdn.example.com); пустой — отдаются с APP_URL.
+    # ASSET_VERSION добавляется как ?v= к файлам без хэша содержимого в имени
+    ASSET_HOST: Optional[str] = None
+    ASSET_VERSION: str = ""
     STATIC_FOLDER: str = "web/static"
     LOGIN: SecretStr = SecretStr(os.getenv("LOGIN"))
     PASSWORD: SecretStr = SecretStr(os.getenv("PASSWORD"))
@@ -23,5 +28,77 @@ class Settings(BaseSettings):
     DB_USER: str = "postgres"
     DB_PASS: str = "1"
 
+    # Что делать со схемой при старте воркера: verify — только сверить ревизию
+    # базы с головой миграций Alembic (схема меняется через alembic upgrade head),
+    # create_all — создать недостающие таблицы (только локальная или одноразовая
+    # база, включается явно), none — ничего не проверять
+    DB_STARTUP: Literal["create_all", "verify", "none"] = "verify"
+
+    # Пул соединений создается в каждом воркере uvicorn: всего к базе
+    # открывается до workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений,
+    # это число должно оставаться меньше max_connections PostgreSQL
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько секунд запрос ждет свободное соединение до ошибки
+    DB_POOL_TIMEOUT: float = 30
+    # Соединения старше DB_POOL_RECYCLE секунд переоткрываются при выдаче из пула.
+    # DB_POOL_PRE_PING добавляет SELECT 1 к каждой выдаче соединения (а fanout
+    # берет несколько на запрос) — включать, только если база или прокси рвут
+    # простаивающие соединения раньше DB_POOL_RECYCLE
+    DB_POOL_RECYCLE: int = 600
+    DB_POOL_PRE_PING: bool = False
+    # Размер кэша подготовленных выражений asyncpg на соединение;
+    # 0 — при работе через pgbouncer в режиме transaction
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Предел времени для параллельных запросов чтения одного ответа API, секунды
+    DB_FANOUT_TIMEOUT: float = 10
+
+    # Пустой REDIS_URL — кэш ответов хранится в памяти процесса. Это только для
+    # одного воркера: invalidate() после записи очищает кэш лишь того воркера,
+    # который ее обработал. С несколькими воркерами uvicorn нужен Redis
+    REDIS_URL: Optional[str] = None
+    CACHE_ENABLED: bool = True
+    # Снимок каталога в воркере сверяется с версией в Redis на каждом запросе;
+    # без Redis (или если он недоступен) снимок живет не дольше этого срока, секунды
+    CATALOG_SNAPSHOT_MAX_AGE: int = 60
+
+    # Пул обработки изображений: число потоков и максимум задач в работе
+    IMAGE_WORKERS: int = 4
+    IMAGE_QUEUE_SIZE: int = 32
+    # Ширины производных изображений (WebP + JPEG), создаваемых при загрузке
+    IMAGE_SIZES: List[int] = [160, 480, 1200]
+
+    # Ответы API меньше этого размера не сжимаются
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # Кэш сжатых ответов в воркере: предел суммарного размера и размер одного
+    # сжатого тела, больше которого ответ в кэш не попадает, байты
+    COMPRESSION_CACHE_BYTES: int = 32 * 1024 * 1024
+    COMPRESSION_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
+
+    # Сколько строк NDJSON импорта товаров записывается за один проход
+    IMPORT_BATCH_SIZE: int = 500
+    # Предельная длина одной строки NDJSON (товар с изображениями в base64), байты
+    IMPORT_MAX_LINE_BYTES: int = 32 * 1024 * 1024
+
+    # Метатеги: время кэширования GET /api/metatags в CDN и период фоновой
+    # перезагрузки из базы (изменения через другие воркеры)
+    METATAGS_MAX_AGE: int = 300
+    METATAGS_REFRESH_INTERVAL: int = 60
+
+    # Сбор метрик для GET /metrics (Prometheus); выключенный сбор ничего не стоит
+    METRICS_ENABLED: bool = False
+
+    # Профилирование запросов (pyinstrument): профилируется доля запросов
+    # PROFILING_SAMPLE_RATE (1.0 — каждый запрос, только для отладки: профилировщик
+    # замедляет запрос), сохраняются последние PROFILING_BUFFER_SIZE из тех,
+    # что дольше PROFILING_THRESHOLD секунд. PROFILING_TOKEN открывает
+    # служебные /internal/* и позволяет профилировать запрос заголовком X-Profile-Token
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[SecretStr] = None
+    PROFILING_THRESHOLD: float = 0.5
+    PROFILING_SAMPLE_RATE: float = 0.01
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_BUFFER_SIZE: int = 20
+
 
 settings = Settings()
@@ -0,0 +1,57 @@
+"""unique preCategoryProducts (address, ru_name, en_name)
+
+Revision ID: 5d8f2b7e6c03
+Revises: c47a0e9f3b15
+Create Date: 2026-10-18 15:05:33.871940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8f2b7e6c03'
+down_revision: Union[str, None] = 'c47a0e9f3b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Дубликаты предкатегорий сливаются в строку с наименьшим id:
+# связи товаров переносятся на нее, лишние строки удаляются
+DEDUPLICATE = [
+    """
+    CREATE TEMPORARY TABLE precategory_duplicates ON COMMIT DROP AS
+    SELECT id, min(id) OVER (PARTITION BY address, ru_name, en_name) AS keep_id
+    FROM "preCategoryProducts"
+    """,
+    """
+    INSERT INTO product_precategory (product_id, precategory_id)
+    SELECT pp.product_id, d.keep_id
+    FROM product_precategory pp
+    JOIN precategory_duplicates d ON d.id = pp.precategory_id
+    WHERE d.id <> d.keep_id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    DELETE FROM product_precategory pp
+    USING precategory_duplicates d
+    WHERE d.id = pp.precategory_id AND d.id <> d.keep_id
+    """,
+    """
+    DELETE FROM "preCategoryProducts" p
+    USING precategory_duplicates d
+    WHERE d.id = p.id AND d.id <> d.keep_id
+    """,
+]
+
+
+def upgrade() -> None:
+    for statement in DEDUPLICATE:
+        op.execute(statement)
+    op.create_unique_constraint('uq_preCategoryProducts_address_names', 'preCategoryProducts', ['address', 'ru_name', 'en_name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_preCategoryProducts_address_names', 'preCategoryProducts', type_='unique')
@@ -0,0 +1,56 @@
+"""product_rating_stats and reviews keyset index
+
+Revision ID: 7a6c1e2d9b48
+Revises: e91b3c6d0f27
+Create Date: 2026-10-18 16:31:44.052716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a6c1e2d9b48'
+down_revision: Union[str, None] = 'e91b3c6d0f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL = """
+INSERT INTO product_rating_stats (product_id, count, sum, rate_1, rate_2, rate_3, rate_4, rate_5)
+SELECT "ProductId", count(*), sum("Rate"),
+       count(*) FILTER (WHERE "Rate" = 1),
+       count(*) FILTER (WHERE "Rate" = 2),
+       count(*) FILTER (WHERE "Rate" = 3),
+       count(*) FILTER (WHERE "Rate" = 4),
+       count(*) FILTER (WHERE "Rate" = 5)
+FROM reviews
+GROUP BY "ProductId"
+"""
+
+
+def upgrade() -> None:
+    op.create_table('product_rating_stats',
+    sa.Column('product_id', sa.BigInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sum', sa.Integer(), nullable=False),
+    sa.Column('rate_1', sa.Integer(), nullable=False),
+    sa.Column('rate_2', sa.Integer(), nullable=False),
+    sa.Column('rate_3', sa.Integer(), nullable=False),
+    sa.Column('rate_4', sa.Integer(), nullable=False),
+    sa.Column('rate_5', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.execute(BACKFILL)
+
+    # (ProductId, id) покрывает и поиск по ProductId, и постраничную выдачу
+    op.create_index('ix_reviews_ProductId_id', 'reviews', ['ProductId', 'id'], unique=False)
+    op.drop_index('ix_reviews_ProductId', table_name='reviews')
+
+
+def downgrade() -> None:
+    op.create_index('ix_reviews_ProductId', 'reviews', ['ProductId'], unique=False)
+    op.drop_index('ix_reviews_ProductId_id', table_name='reviews')
+    op.drop_table('product_rating_stats')
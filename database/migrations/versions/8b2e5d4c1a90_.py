@@ -0,0 +1,68 @@
+"""product_form and product_color association tables
+
+Revision ID: 8b2e5d4c1a90
+Revises: 3f1c9a7d52e4
+Create Date: 2026-10-18 13:40:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5d4c1a90'
+down_revision: Union[str, None] = '3f1c9a7d52e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Перенос JSON-списков options_formId/options_colorId в таблицы связей.
+# Порядок выбора сохраняется в position, id удаленных форм и цветов
+# и повторы пропускаются.
+BACKFILL = """
+INSERT INTO {table} (product_id, {key}, position)
+SELECT p.id, t.id, ids.ord - 1
+FROM products p
+CROSS JOIN LATERAL json_array_elements_text(p."{column}") WITH ORDINALITY AS ids(value, ord)
+JOIN {target} t ON t.id = ids.value::bigint
+WHERE json_typeof(p."{column}") = 'array'
+ORDER BY p.id, ids.ord
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table('product_form',
+    sa.Column('product_id', sa.BigInteger(), nullable=False),
+    sa.Column('form_id', sa.BigInteger(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['form_id'], ['forms.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'form_id')
+    )
+    op.create_index('ix_product_form_form_id', 'product_form', ['form_id'], unique=False)
+    op.create_table('product_color',
+    sa.Column('product_id', sa.BigInteger(), nullable=False),
+    sa.Column('color_id', sa.BigInteger(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['color_id'], ['colors.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'color_id')
+    )
+    op.create_index('ix_product_color_color_id', 'product_color', ['color_id'], unique=False)
+
+    op.execute(BACKFILL.format(
+        table='product_form', key='form_id', column='options_formId', target='forms'
+    ))
+    op.execute(BACKFILL.format(
+        table='product_color', key='color_id', column='options_colorId', target='colors'
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_color_color_id', table_name='product_color')
+    op.drop_table('product_color')
+    op.drop_index('ix_product_form_form_id', table_name='product_form')
+    op.drop_table('product_form')
@@ -0,0 +1,48 @@
+"""product full-text and trigram search
+
+Revision ID: b2d94f0e8a61
+Revises: 7a6c1e2d9b48
+Create Date: 2026-10-18 17:12:05.390428
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d94f0e8a61'
+down_revision: Union[str, None] = '7a6c1e2d9b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_RU = (
+    "setweight(to_tsvector('russian', coalesce(ru_name_name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(ru_name_desc, '')), 'B')"
+)
+SEARCH_EN = (
+    "setweight(to_tsvector('english', coalesce(en_name_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(en_name_desc, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('products', sa.Column('search_ru', postgresql.TSVECTOR(), sa.Computed(SEARCH_RU, persisted=True), nullable=True))
+    op.add_column('products', sa.Column('search_en', postgresql.TSVECTOR(), sa.Computed(SEARCH_EN, persisted=True), nullable=True))
+    op.create_index('ix_products_search_ru', 'products', ['search_ru'], unique=False, postgresql_using='gin')
+    op.create_index('ix_products_search_en', 'products', ['search_en'], unique=False, postgresql_using='gin')
+    op.create_index('ix_products_ru_name_name_trgm', 'products', ['ru_name_name'], unique=False, postgresql_using='gin', postgresql_ops={'ru_name_name': 'gin_trgm_ops'})
+    op.create_index('ix_products_en_name_name_trgm', 'products', ['en_name_name'], unique=False, postgresql_using='gin', postgresql_ops={'en_name_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_en_name_name_trgm', table_name='products', postgresql_using='gin')
+    op.drop_index('ix_products_ru_name_name_trgm', table_name='products', postgresql_using='gin')
+    op.drop_index('ix_products_search_en', table_name='products', postgresql_using='gin')
+    op.drop_index('ix_products_search_ru', table_name='products', postgresql_using='gin')
+    op.drop_column('products', 'search_en')
+    op.drop_column('products', 'search_ru')
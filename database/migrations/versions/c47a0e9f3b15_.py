@@ -0,0 +1,51 @@
+"""category_precategory association table
+
+Revision ID: c47a0e9f3b15
+Revises: 8b2e5d4c1a90
+Create Date: 2026-10-18 14:22:57.604311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a0e9f3b15'
+down_revision: Union[str, None] = '8b2e5d4c1a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Перенос JSON-списка category."preCategory" в таблицу связей
+# с сохранением порядка; id удаленных предкатегорий и повторы пропускаются
+BACKFILL = """
+INSERT INTO category_precategory (category_id, precategory_id, position)
+SELECT c.id, p.id, ids.ord - 1
+FROM category c
+CROSS JOIN LATERAL json_array_elements_text(c."preCategory") WITH ORDINALITY AS ids(value, ord)
+JOIN "preCategory" p ON p.id = ids.value::bigint
+WHERE json_typeof(c."preCategory") = 'array'
+ORDER BY c.id, ids.ord
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table('category_precategory',
+    sa.Column('category_id', sa.BigInteger(), nullable=False),
+    sa.Column('precategory_id', sa.BigInteger(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['precategory_id'], ['preCategory.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id', 'precategory_id')
+    )
+    op.create_index('ix_category_precategory_precategory_id', 'category_precategory', ['precategory_id'], unique=False)
+
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_category_precategory_precategory_id', table_name='category_precategory')
+    op.drop_table('category_precategory')
@@ -13,8 +13,12 @@ from sqlalchemy import (
     TIMESTAMP,
     BigInteger,
     DateTime,
+    Index,
+    UniqueConstraint,
+    Computed,
     func
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy import Column, String, Boolean, Integer, TIMESTAMP, ForeignKey 
@@ -33,11 +37,72 @@ product_precategory_association = Table(
     Base.metadata,
     Column("product_id", ForeignKey("products.id"), primary_key=True),
     Column("precategory_id", ForeignKey("preCategoryProducts.id"), primary_key=True),
+    # Обратный поиск товаров по предкатегории
+    Index("ix_product_precategory_precategory_id", "precategory_id"),
+)
+
+# Выбранные у товара формы и цвета; position хранит порядок выбора.
+# Обратные индексы по form_id/color_id нужны для поиска товаров по форме или цвету
+product_form_association = Table(
+    "product_form",
+    Base.metadata,
+    Column("product_id", ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+    Column("form_id", ForeignKey("forms.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, nullable=False, default=0),
+    Index("ix_product_form_form_id", "form_id"),
+)
+
+product_color_association = Table(
+    "product_color",
+    Base.metadata,
+    Column("product_id", ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+    Column("color_id", ForeignKey("colors.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, nullable=False, default=0),
+    Index("ix_product_color_color_id", "color_id"),
+)
+
+# Предкатегории в меню категории; position хранит порядок пунктов
+category_precategory_association = Table(
+    "category_precategory",
+    Base.metadata,
+    Column("category_id", ForeignKey("category.id", ondelete="CASCADE"), primary_key=True),
+    Column("precategory_id", ForeignKey("preCategory.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, nullable=False, default=0),
+    Index("ix_category_precategory_precategory_id", "precategory_id"),
+)
+
+
+# Поисковые документы товара: название важнее описания (веса A и B)
+SEARCH_RU = (
+    "setweight(to_tsvector('russian', coalesce(ru_name_name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(ru_name_desc, '')), 'B')"
+)
+SEARCH_EN = (
+    "setweight(to_tsvector('english', coalesce(en_name_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(en_name_desc, '')), 'B')"
 )
 
 
 class Products(Base):
     __tablename__ = "products"
+    # GIN по tsvector — полнотекстовый поиск, GIN gin_trgm_ops по названиям —
+    # нечеткий поиск с опечатками (нужно расширение pg_trgm)
+    __table_args__ = (
+        Index("ix_products_search_ru", "search_ru", postgresql_using="gin"),
+        Index("ix_products_search_en", "search_en", postgresql_using="gin"),
+        Index(
+            "ix_products_ru_name_name_trgm",
+            "ru_name_name",
+            postgresql_using="gin",
+            postgresql_ops={"ru_name_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_products_en_name_name_trgm",
+            "en_name_name",
+            postgresql_using="gin",
+            postgresql_ops={"en_name_name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, unique=True)
     ru_name_name: Mapped[str] = mapped_column(String(255))
@@ -58,9 +123,17 @@ class Products(Base):
     price_en: Mapped[float] = mapped_column(Float, default=0.0)
     options_isForm: Mapped[bool] = mapped_column(Boolean, default=False)
     options_isColor: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Старые JSON-списки id; чтение идет через product_form/product_color
     options_formId: Mapped[list[int]] = mapped_column(JSON)
     options_colorId: Mapped[list[int]] = mapped_column(JSON)
 
+    search_ru: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, Computed(SEARCH_RU, persisted=True), deferred=True
+    )
+    search_en: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, Computed(SEARCH_EN, persisted=True), deferred=True
+    )
+
 
 class Colors(Base):
     __tablename__ = "colors"
@@ -85,6 +158,8 @@ class Forms(Base):
 
 class Reviews(Base):
     __tablename__ = "reviews"
+    # Отзывы товара постранично: WHERE ProductId = ? AND id > ? ORDER BY id
+    __table_args__ = (Index("ix_reviews_ProductId_id", "ProductId", "id"),)
    
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     Title: Mapped[str] = mapped_column(String(255))
@@ -93,13 +168,29 @@ class Reviews(Base):
     ProductId: Mapped[int] = mapped_column(BigInteger, nullable=False)
 
 
+class ProductRatingStats(Base):
+    __tablename__ = "product_rating_stats"
+
+    # Счетчики по отзывам товара, обновляются в одной транзакции с отзывами
+    product_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    sum: Mapped[int] = mapped_column(Integer, default=0)
+    # Гистограмма оценок 1–5
+    rate_1: Mapped[int] = mapped_column(Integer, default=0)
+    rate_2: Mapped[int] = mapped_column(Integer, default=0)
+    rate_3: Mapped[int] = mapped_column(Integer, default=0)
+    rate_4: Mapped[int] = mapped_column(Integer, default=0)
+    rate_5: Mapped[int] = mapped_column(Integer, default=0)
+
+
 class Category(Base):
     __tablename__ = "category"
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    address: Mapped[str] = mapped_column(String(255))
+    address: Mapped[str] = mapped_column(String(255), index=True)
     ru_name: Mapped[str] = mapped_column(String(255))
     en_name: Mapped[str] = mapped_column(String(255))
+    # Старый JSON-список id; чтение идет через category_precategory
     preCategory: Mapped[list[int]] = mapped_column(JSON)
 
 
@@ -114,6 +205,12 @@ class PreCategory(Base):
 
 class PreCategoryProducts(Base):
     __tablename__ = "preCategoryProducts"
+    # По этой тройке импорт товаров находит предкатегорию (INSERT ... ON CONFLICT)
+    __table_args__ = (
+        UniqueConstraint(
+            "address", "ru_name", "en_name", name="uq_preCategoryProducts_address_names"
+        ),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     address: Mapped[str] = mapped_column(String(255))
@@ -136,3 +233,12 @@ class Metatags(Base):
     title: Mapped[str] = mapped_column(String(60))
     description: Mapped[str] = mapped_column(String(160))
     keywords: Mapped[str] = mapped_column(String(1024))
+
+
+class ImageBlobs(Base):
+    __tablename__ = "image_blobs"
+
+    # sha256 исходных байтов изображения
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    path: Mapped[str] = mapped_column(String(255), unique=True)
+    refcount: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,91 @@
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Верхние границы корзин гистограммы ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    """
+    Время получения соединения из пула. Пока все соединения заняты,
+    запрос ждет в очереди пула — рост ожидания означает, что пул мал
+    для текущей нагрузки (или соединения долго не возвращаются).
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.buckets: List[int] = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe(self, elapsed: float):
+        self.checkouts += 1
+        self.wait_time_total += elapsed
+        self.wait_time_max = max(self.wait_time_max, elapsed)
+        for index, bound in enumerate(WAIT_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def histogram(self) -> Dict[str, int]:
+        # Накопительные счетчики, как в гистограммах Prometheus
+        result = {}
+        total = 0
+        for bound, count in zip(WAIT_BUCKETS + ("+Inf",), self.buckets):
+            total += count
+            result[str(bound)] = total
+        return result
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, который замеряет ожидание свободного соединения."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "TimedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        metrics = self.metrics
+        started = time.perf_counter()
+        metrics.waiting += 1
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.waiting -= 1
+        metrics.observe(time.perf_counter() - started)
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        metrics = self.metrics
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # Отрицательное значение — сколько постоянных соединений еще не открыто
+            "overflow": self.overflow(),
+            "waiting": metrics.waiting,
+            "checkouts": metrics.checkouts,
+            "timeouts": metrics.timeouts,
+            "wait_time_avg": (
+                metrics.wait_time_total / metrics.checkouts if metrics.checkouts else 0.0
+            ),
+            "wait_time_max": metrics.wait_time_max,
+            "wait_time_histogram": metrics.histogram(),
+        }
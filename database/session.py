@@ -1,25 +1,75 @@
-from typing import AsyncGenerator
+import os
+from typing import AsyncGenerator, Set
 
-from sqlalchemy import MetaData, Column, String, BigInteger, Boolean
+from sqlalchemy import MetaData, Column, String, BigInteger, Boolean, text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from config.config import settings
 from .models import Base
+from .pool import TimedQueuePool
 
 
 DATABASE_URL = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASS}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 
 
-engine = create_async_engine(DATABASE_URL, echo=False, pool_size=20, pool_recycle=600)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # Кэш SQLAlchemy для prepare() и собственный кэш asyncpg для остальных запросов
+    connect_args={
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    },
+)
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
 async def create_db():
     async with engine.begin() as conn:
+        # pg_trgm нужен для индексов нечеткого поиска по названиям товаров
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
 
 
+def alembic_heads() -> Set[str]:
+    # Alembic нужен только для проверки, поэтому импортируется здесь
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "database", "migrations"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+async def verify_db_revision():
+    """
+    Проверяет, что база на последней миграции Alembic. В отличие от
+    create_db не выполняет запросов к каталогу для каждой таблицы и не
+    меняет схему: миграции накатываются отдельно (alembic upgrade head).
+    """
+    heads = alembic_heads()
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            current = set(result.scalars())
+        except ProgrammingError:
+            current = set()
+    if current != heads:
+        raise RuntimeError(
+            f"Database revision {', '.join(sorted(current)) or 'none'} does not match "
+            f"migration head {', '.join(sorted(heads))}, run 'alembic upgrade head'"
+        )
+
+
 async def drop_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -1,4 +1,5 @@
 import os 
+import asyncio
 from typing import Any, List, Optional, Dict
 from config.config import settings
 
@@ -6,26 +7,54 @@ from fastapi_users import fastapi_users, FastAPIUsers
 
 from fastapi import FastAPI, Request, Depends, HTTPException, Request, Cookie, status
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from database.session import create_db, drop_db
+from database.session import create_db, drop_db, verify_db_revision, async_session_maker, engine
 
 from api.routers import router as api_router
 from api.auth import router as auth_router
+from api.internal import router as internal_router
+from api.cache import init_cache
+from api.images import image_executor
+from api.static import CachedStaticFiles
+from api.compression import CompressionMiddleware
+from api.metatags import metatag_resolver, refresh_periodically
+from api.metrics import router as metrics_router, install as install_metrics
+from api.profiling import install as install_profiling
 
 from config.config import settings
 
+background_tasks = []
+
 
 async def on_startup():
     drop_database = False
     if drop_database == True:
         await drop_db()
-    await create_db()
-    print("Database created")
+    if settings.DB_STARTUP == "create_all":
+        await create_db()
+        print("Database created")
+    elif settings.DB_STARTUP == "verify":
+        await verify_db_revision()
+    await init_cache()
+    # Метатеги загружаются заранее, чтобы первые запросы страниц не ждали базу
+    await metatag_resolver.load(async_session_maker())
+    background_tasks.append(
+        asyncio.create_task(
+            refresh_periodically(
+                metatag_resolver, async_session_maker, settings.METATAGS_REFRESH_INTERVAL
+            )
+        )
+    )
+
+
+async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    image_executor.shutdown()
 
-app = FastAPI(title="Epocha Admin Panel", on_startup=[on_startup])
+app = FastAPI(title="Epocha Admin Panel", on_startup=[on_startup], on_shutdown=[on_shutdown])
 templates = Jinja2Templates(directory="web/templates")
-app.mount("/static", StaticFiles(directory=rf"{settings.STATIC_FOLDER}"), name="static")
+app.mount("/static", CachedStaticFiles(directory=rf"{settings.STATIC_FOLDER}"), name="static")
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,9 +63,15 @@ app.add_middleware(
     allow_methods=["GET", "POST", "OPTIONS", "DELETE", "PATCH", "PUT"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+install_profiling(app)
+# Снаружи остальных middleware: время и размер ответа — как их видит клиент
+install_metrics(app, engine)
 
 app.include_router(api_router)
 app.include_router(auth_router)
+app.include_router(internal_router)
+app.include_router(metrics_router)
 
 # 
 # Default endpoints
@@ -0,0 +1,77 @@
+import os
+import asyncio
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models import Base, Products
+from database.pool import TimedQueuePool
+from api.routers import load_products
+
+# Отдельная база: схема в ней пересоздается
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+async def concurrent_pages(concurrency: int, pool_size: int):
+    engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=5,
+    )
+    try:
+        async with engine.begin() as conn:
+            try:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            except DBAPIError:
+                pytest.skip("pg_trgm is not available")
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                insert(Products),
+                [
+                    {
+                        "id": n,
+                        "ru_name_name": f"Товар {n}",
+                        "ru_name_desc": "",
+                        "en_name_name": f"Product {n}",
+                        "en_name_desc": "",
+                        "images": [],
+                        "isFrom": False,
+                        "price_ru": 100.0,
+                        "price_en": 1.0,
+                        "options_isForm": False,
+                        "options_isColor": False,
+                        "options_formId": [],
+                        "options_colorId": [],
+                    }
+                    for n in range(1, 21)
+                ],
+            )
+
+        maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def request():
+            async with maker() as session:
+                products, _ = await load_products(session, limit=10)
+                return products
+
+        results = await asyncio.gather(*(request() for _ in range(concurrency)))
+        return results, engine.pool.stats()
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_pages_do_not_exhaust_small_pool():
+    # Каждая страница читает связанные строки в трех ветках fanout; запросов
+    # намного больше, чем соединений, но ни один не должен ждать до таймаута
+    results, stats = asyncio.run(concurrent_pages(concurrency=24, pool_size=2))
+
+    assert all(len(products) == 10 for products in results)
+    assert stats["timeouts"] == 0
+    assert stats["checked_out"] == 0
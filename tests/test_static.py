@@ -0,0 +1,46 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.static import CachedStaticFiles, parse_range
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("bytes=0-3", (0, 3)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-4", (6, 9)),
+        ("bytes=8-100", (8, 9)),
+        # Неверная запись диапазона: заголовок игнорируется
+        ("bytes=5-2", None),
+        ("bytes=0-1,4-5", None),
+        # Диапазон за концом файла невыполним
+        ("bytes=10-", (10, 10)),
+        ("bytes=12-20", (10, 10)),
+    ],
+)
+def test_parse_range(value, expected):
+    assert parse_range(value, 10) == expected
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "file.txt").write_bytes(b"0123456789")
+    app = FastAPI()
+    app.mount("/static", CachedStaticFiles(directory=tmp_path), name="static")
+    return TestClient(app)
+
+
+def test_inverted_range_serves_full_file(client):
+    response = client.get("/static/file.txt", headers={"Range": "bytes=5-2"})
+
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+
+
+def test_range_past_end_is_unsatisfiable(client):
+    response = client.get("/static/file.txt", headers={"Range": "bytes=10-12"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */10"